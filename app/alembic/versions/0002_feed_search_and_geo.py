@@ -0,0 +1,105 @@
+"""Feed pagination, sighting coordinates, filtered search and sighting summary
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.db.migrations import create_index, drop_index, is_postgres
+from app.models import FTS_CONFIG
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("sighting", sa.Column("lat", sa.Float(), nullable=True))
+    op.add_column("sighting", sa.Column("lon", sa.Float(), nullable=True))
+    op.add_column(
+        "sighting",
+        sa.Column("geohash", sqlmodel.sql.sqltypes.AutoString(12), nullable=True),
+    )
+    op.add_column("search", sa.Column("last_sighting_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "search",
+        sa.Column(
+            "last_sighting_loc", sqlmodel.sql.sqltypes.AutoString(), nullable=True
+        ),
+    )
+    op.add_column(
+        "search",
+        sa.Column("sighting_count", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    create_index("ix_search_created_at_id", "search", ["created_at", "id"])
+    create_index(
+        "ix_search_user_id_created_at_id", "search", ["user_id", "created_at", "id"]
+    )
+    create_index(
+        "ix_sighting_search_id_datetime_id",
+        "sighting",
+        ["search_id", "datetime", "id"],
+    )
+    create_index("ix_sighting_geohash", "sighting", ["geohash"])
+    create_index(
+        "ix_pet_kind_breed_fur_color_size",
+        "pet",
+        [
+            sa.column("kind"),
+            sa.text("lower(breed)"),
+            sa.text("lower(fur_color)"),
+            sa.text("lower(size)"),
+        ],
+    )
+    if is_postgres():
+        for table, column in (("search", "poster"), ("pet", "name")):
+            create_index(
+                f"ix_{table}_{column}_fts",
+                table,
+                [sa.text(f"to_tsvector('{FTS_CONFIG}', {column})")],
+                postgresql_using="gin",
+            )
+
+    # Summaries of the sightings reported so far
+    op.execute("""
+        UPDATE search SET
+            sighting_count = (
+                SELECT count(*) FROM sighting WHERE sighting.search_id = search.id
+            ),
+            last_sighting_at = (
+                SELECT max(datetime) FROM sighting
+                WHERE sighting.search_id = search.id
+            ),
+            last_sighting_loc = (
+                SELECT loc FROM sighting WHERE sighting.search_id = search.id
+                ORDER BY datetime DESC, id DESC LIMIT 1
+            )
+        """)
+
+
+def downgrade() -> None:
+    if is_postgres():
+        drop_index("ix_pet_name_fts", "pet")
+        drop_index("ix_search_poster_fts", "search")
+    drop_index("ix_pet_kind_breed_fur_color_size", "pet")
+    drop_index("ix_sighting_geohash", "sighting")
+    drop_index("ix_sighting_search_id_datetime_id", "sighting")
+    drop_index("ix_search_user_id_created_at_id", "search")
+    drop_index("ix_search_created_at_id", "search")
+
+    op.drop_column("search", "sighting_count")
+    op.drop_column("search", "last_sighting_loc")
+    op.drop_column("search", "last_sighting_at")
+    op.drop_column("sighting", "geohash")
+    op.drop_column("sighting", "lon")
+    op.drop_column("sighting", "lat")
@@ -0,0 +1,29 @@
+"""Index the foreign keys not yet leading an index
+
+Search.user_id and Sighting.search_id lead the composite indexes of 0002.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from typing import Sequence, Union
+
+from app.db.migrations import create_index, drop_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index("ix_pet_user_id", "pet", ["user_id"])
+    create_index("ix_search_pet_id", "search", ["pet_id"])
+
+
+def downgrade() -> None:
+    drop_index("ix_search_pet_id", "search")
+    drop_index("ix_pet_user_id", "pet")
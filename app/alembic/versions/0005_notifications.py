@@ -0,0 +1,71 @@
+"""Add subscriptions and the notification outbox
+
+Areas users want to hear about, and the notifications matched to them
+by app.db.notifications.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscription",
+        sa.Column("lat", sa.Float(), nullable=False),
+        sa.Column("lon", sa.Float(), nullable=False),
+        sa.Column("radius_km", sa.Float(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_subscription_updated_at", "subscription", ["updated_at"])
+    op.create_index("ix_subscription_user_id", "subscription", ["user_id"])
+
+    op.create_table(
+        "notification",
+        sa.Column("event", sqlmodel.sql.sqltypes.AutoString(16), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("search_id", sa.Integer(), nullable=False),
+        sa.Column("sighting_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["search_id"], ["search.id"]),
+        sa.ForeignKeyConstraint(["sighting_id"], ["sighting.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notification_search_id", "notification", ["search_id"])
+    op.create_index("ix_notification_sighting_id", "notification", ["sighting_id"])
+    op.create_index(
+        "ix_notification_user_id_created_at_id",
+        "notification",
+        ["user_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notification_user_id_created_at_id", "notification")
+    op.drop_index("ix_notification_sighting_id", "notification")
+    op.drop_index("ix_notification_search_id", "notification")
+    op.drop_table("notification")
+    op.drop_index("ix_subscription_user_id", "subscription")
+    op.drop_index("ix_subscription_updated_at", "subscription")
+    op.drop_table("subscription")
@@ -0,0 +1,41 @@
+"""Track when each search last changed
+
+Lets the in-memory found index (app.db.found) sync only changed searches.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import create_index, drop_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("search", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE search SET updated_at = CASE
+            WHEN last_sighting_at > created_at THEN last_sighting_at
+            ELSE created_at
+        END
+        """)
+    with op.batch_alter_table("search") as batch_op:
+        batch_op.alter_column("updated_at", nullable=False)
+
+    create_index("ix_search_updated_at", "search", ["updated_at"])
+
+
+def downgrade() -> None:
+    drop_index("ix_search_updated_at", "search")
+    op.drop_column("search", "updated_at")
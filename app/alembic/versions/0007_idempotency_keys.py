@@ -0,0 +1,42 @@
+"""Add the idempotency key table
+
+Responses stored under Idempotency-Key headers by IdempotencyMiddleware,
+purged in bulk through the expires_at index.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotencykey",
+        sa.Column("key", sqlmodel.sql.sqltypes.AutoString(320), nullable=False),
+        sa.Column("fingerprint", sqlmodel.sql.sqltypes.AutoString(64), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("headers", sa.JSON(), nullable=True),
+        sa.Column("body", sa.LargeBinary(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index("ix_idempotencykey_expires_at", "idempotencykey", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotencykey_expires_at", "idempotencykey")
+    op.drop_table("idempotencykey")
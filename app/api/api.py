@@ -1,24 +1,55 @@
-from fastapi import APIRouter
-from sqlmodel import select
-from app.api.deps import SessionDep
+from fastapi import APIRouter, Depends
 
-from app.api.endpoints import login, users, pets, searches
-from app.models import Search, SearchReadWAll
+from app.api.endpoints import (
+    feed,
+    health,
+    login,
+    metrics,
+    notifications,
+    users,
+    pets,
+    searches,
+    sightings,
+    static,
+)
+from app.api.deps import rate_limit
+
+# Requests count against "default" unless a route has a budget of its own
+limited = [Depends(rate_limit("default"))]
 
 api_router = APIRouter()
-api_router.include_router(login.router, prefix="/login", tags=["login"])
-api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(pets.router, prefix="/users/{user_id}/pets", tags=["pets"])
 api_router.include_router(
-    searches.router, prefix="/users/{user_id}/searches", tags=["searches"]
+    login.router, prefix="/login", tags=["login"], dependencies=limited
 )
-
-
-@api_router.get(
-    "/feed",
-    response_model=list[SearchReadWAll],
-)
-async def feed(session: SessionDep, skip: int = 0, limit: int = 10):
-    statement = select(Search).offset(skip).limit(limit)
-    searches = session.exec(statement).all()
-    return searches
+api_router.include_router(
+    users.router, prefix="/users", tags=["users"], dependencies=limited
+)
+api_router.include_router(
+    notifications.router,
+    prefix="/users/me",
+    tags=["notifications"],
+    dependencies=limited,
+)
+api_router.include_router(
+    pets.router, prefix="/users/{user_id}/pets", tags=["pets"], dependencies=limited
+)
+api_router.include_router(
+    searches.router,
+    prefix="/users/{user_id}/searches",
+    tags=["searches"],
+    dependencies=limited,
+)
+api_router.include_router(
+    sightings.router, prefix="/searches", tags=["searches"], dependencies=limited
+)
+api_router.include_router(
+    feed.router,
+    prefix="/feed",
+    tags=["feed"],
+    dependencies=[Depends(rate_limit("feed"))],
+)
+api_router.include_router(
+    static.router, prefix="/static", tags=["static"], dependencies=limited
+)
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+api_router.include_router(health.router, prefix="/health", tags=["health"])
@@ -1,23 +1,52 @@
+from dataclasses import dataclass
 from datetime import datetime
 import functools
-from typing import Annotated, Callable, Union
+import math
+import secrets
+from typing import (
+    Annotated,
+    Any,
+    Awaitable,
+    Callable,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
 
-from pydantic import ValidationError
-from fastapi import Depends, HTTPException, status
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic_core import to_json
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from jose import jwt, JWTError
 
 from app.core import security
+from app.core.cache import CachedPage, PageCache, user_cache
 from app.core.config import settings
+from app.core.events import Subscription
+from app.core.ratelimit import rate_limiter
 from app.db.engine import engine
-from app.models import Pet, Search, TokenPayload, User
+from app.db.pagination import InvalidCursor
+from app.db.replicas import read_router
+from app.models import (
+    AuthUser,
+    BatchItemError,
+    ListFormat,
+    Pet,
+    Search,
+    TokenPayload,
+    User,
+)
 
 
-def val_user_response(fn: Callable[..., Union[User, None]], user_id: int | None = None):
+def val_user_response(
+    fn: Callable[..., Awaitable[Union[User, None]]], user_id: int | None = None
+):
     @functools.wraps(fn)
-    def val_user_res_deco(*args, **kwargs):
-        user = fn(*args, **kwargs)
+    async def val_user_res_deco(*args, **kwargs):
+        user = await fn(*args, **kwargs)
         if not user:
             raise HTTPException(status.HTTP_404_NOT_FOUND, "User not found")
         if not user.is_active:
@@ -29,10 +58,12 @@ def val_user_response(fn: Callable[..., Union[User, None]], user_id: int | None
     return val_user_res_deco
 
 
-def val_pet_response(fn: Callable[..., Union[Pet, None]], user_id: int | None = None):
+def val_pet_response(
+    fn: Callable[..., Awaitable[Union[Pet, None]]], user_id: int | None = None
+):
     @functools.wraps(fn)
-    def val_pet_res_deco(*args, **kwargs):
-        pet = fn(*args, **kwargs)
+    async def val_pet_res_deco(*args, **kwargs):
+        pet = await fn(*args, **kwargs)
         if not pet:
             raise HTTPException(status.HTTP_404_NOT_FOUND, "Pet not found")
         if user_id is not None and not pet.user_id == user_id:
@@ -43,11 +74,11 @@ def val_pet_response(fn: Callable[..., Union[Pet, None]], user_id: int | None =
 
 
 def val_search_response(
-    fn: Callable[..., Union[Search, None]], pet_id: int | None = None
+    fn: Callable[..., Awaitable[Union[Search, None]]], pet_id: int | None = None
 ):
     @functools.wraps(fn)
-    def val_search_res_deco(*args, **kwargs):
-        search = fn(*args, **kwargs)
+    async def val_search_res_deco(*args, **kwargs):
+        search = await fn(*args, **kwargs)
         if not search:
             raise HTTPException(status.HTTP_404_NOT_FOUND, "Search not found")
         if pet_id is not None and not search.pet_id == pet_id:
@@ -59,36 +90,415 @@ def val_search_response(
     return val_search_res_deco
 
 
+M = TypeVar("M", bound=BaseModel)
+
+
+def val_batch(model: type[M], items: list[Any]) -> tuple[list[M], list[BatchItemError]]:
+    """
+    Validates each item of a batch on its own, so one bad item is reported
+    by index instead of rejecting the whole request.
+    """
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Batches are limited to {settings.BATCH_MAX_ITEMS} items",
+        )
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError as e:
+            errors.append(
+                BatchItemError(
+                    index=index,
+                    errors=e.errors(include_url=False, include_context=False),
+                )
+            )
+    return valid, errors
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_response(
+    fn: Callable[..., Awaitable[tuple[list, str | None]]], response: Response
+):
+    @functools.wraps(fn)
+    async def page_res_deco(*args, **kwargs):
+        try:
+            items, next_cursor = await fn(*args, **kwargs)
+        except InvalidCursor:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return items
+
+    return page_res_deco
+
+
+@functools.cache
+def list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+# Nested entities the normalized format lists once, by field and table
+NORMALIZED_ENTITIES = {"user": "users", "pet": "pets"}
+
+
+@dataclass(frozen=True)
+class ListShape:
+    # model_dump include= of one item, None for every field
+    include: dict | None = None
+    normalized: bool = False
+
+    @property
+    def full(self) -> bool:
+        return self.include is None and not self.normalized
+
+
+def nested_model(annotation: Any) -> type[BaseModel] | None:
+    """The model in an annotation such as `UserRead | None` or `list[...]`."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        if model := nested_model(arg):
+            return model
+    return None
+
+
+def field_selection(model: type[BaseModel], fields: str) -> dict:
+    """
+    The include= of `model` for `fields`, comma-separated field names with
+    dots into nested models, as in "id,poster,pet.name". Raises ValueError
+    with the first unknown field.
+    """
+    include: dict = {}
+    for path in filter(None, (field.strip() for field in fields.split(","))):
+        names = path.split(".")
+        current: type[BaseModel] | None = model
+        spec = include
+        for name in names[:-1]:
+            field = current.model_fields.get(name) if current else None
+            if field is None:
+                raise ValueError(path)
+            current = nested_model(field.annotation)
+            if spec.get(name) is True:
+                # The whole field is already selected
+                break
+            spec = spec.setdefault(name, {})
+            if get_origin(field.annotation) is list:
+                spec = spec.setdefault("__all__", {})
+        else:
+            if current is None or names[-1] not in current.model_fields:
+                raise ValueError(path)
+            spec[names[-1]] = True
+    return include
+
+
+def list_shape(model: type[BaseModel]):
+    """
+    Dependency reading how a list of `model` is to be sent: a sparse
+    fieldset in `fields`, and `format`.
+    """
+
+    async def list_shape_dep(
+        fields: str | None = Query(
+            default=None,
+            description="Comma-separated fields to send, dotted for nested "
+            "ones, as in id,poster,pet.name,pet.image",
+        ),
+        list_format: ListFormat = Query(
+            default=ListFormat.FULL,
+            alias="format",
+            description="normalized: users and pets are sent once, in "
+            '{"items": [...], "users": {id: ...}, "pets": {id: ...}}, and '
+            "items refer to them by user_id and pet_id",
+        ),
+    ) -> ListShape:
+        include = None
+        if fields:
+            try:
+                include = field_selection(model, fields)
+            except ValueError as e:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Unknown field {e}")
+        normalized = list_format == ListFormat.NORMALIZED
+        if normalized and include is not None:
+            # Entities are keyed by id, so it's always sent
+            for field in NORMALIZED_ENTITIES:
+                if isinstance(include.get(field), dict):
+                    include[field]["id"] = True
+        return ListShape(include, normalized)
+
+    return list_shape_dep
+
+
+def dump_list(
+    model: type[BaseModel], items: list, shape: ListShape = ListShape()
+) -> bytes:
+    """
+    JSON of `items` (ORM objects) as a list of `model`, validated and
+    encoded in one compiled pass each, in the given `shape`.
+    """
+    adapter = list_adapter(model)
+    validated = adapter.validate_python(items, from_attributes=True)
+    include = None if shape.include is None else {"__all__": shape.include}
+    if not shape.normalized:
+        return adapter.dump_json(validated, include=include)
+
+    rows = adapter.dump_python(validated, mode="json", include=include)
+    tables: dict[str, dict[str, Any]] = {
+        table: {}
+        for field, table in NORMALIZED_ENTITIES.items()
+        if field in model.model_fields
+        and (shape.include is None or field in shape.include)
+    }
+    for row in rows:
+        for field, table in NORMALIZED_ENTITIES.items():
+            if field not in row:
+                continue
+            entity = row.pop(field)
+            row[f"{field}_id"] = entity["id"] if entity else None
+            if entity:
+                tables[table].setdefault(str(entity["id"]), entity)
+    return to_json({"items": rows, **tables})
+
+
+def list_response(
+    model: type[BaseModel],
+    items: list,
+    response: Response | None = None,
+    shape: ListShape = ListShape(),
+) -> Response | list:
+    """
+    With FAST_JSON_RESPONSES, or a `shape` other than the full one,
+    serializes a list endpoint's result with dump_list instead of FastAPI's
+    response_model handling, which builds Python dicts and runs them
+    through json.dumps. Keeps the X-Next-Cursor header set on `response`.
+    """
+    if shape.full and not settings.FAST_JSON_RESPONSES:
+        return items
+    headers = {}
+    if response is not None and NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    return Response(
+        dump_list(model, items, shape), media_type="application/json", headers=headers
+    )
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def cached_page_response(
+    request: Request,
+    cache: PageCache,
+    render: Callable[[Response], Awaitable[bytes]],
+) -> Response:
+    """
+    Serves the JSON page for `request` from `cache`, calling `render` to
+    build and store it on a miss. `render` gets a Response to set the
+    X-Next-Cursor header on, and returns the serialized body. Answers 304
+    when the client's If-None-Match already has the page.
+
+    Clients reading their own writes skip the cache both ways: its pages
+    may come from the replica, and theirs come from the primary.
+    """
+    query = sorted(request.query_params.multi_items())
+    key = f"{request.url.path}?{query}"
+
+    bypass = reads_primary(request)
+    page = None if bypass else await cache.get(key)
+    cache_status = "HIT"
+    if page is None:
+        cache_status = "BYPASS" if bypass else "MISS"
+        generation = cache.generation
+        scratch = Response()
+        body = await render(scratch)
+        next_cursor = scratch.headers.get(NEXT_CURSOR_HEADER)
+        page = CachedPage.build(
+            body, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        )
+        if not bypass:
+            await cache.set(key, page, generation)
+
+    headers = {
+        **page.headers,
+        "ETag": page.etag,
+        "Cache-Control": "no-cache",
+        "X-Cache": cache_status,
+    }
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(page.body, media_type="application/json", headers=headers)
+
+
+def event_stream_response(subscription: Subscription) -> StreamingResponse:
+    return StreamingResponse(
+        subscription.stream(settings.EVENTS_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PATH}/login/token")
 
 
-def get_db():
-    with Session(engine) as session:
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+# Carries read_router.sticky_token() back from clients that wrote, as a
+# cookie or, for clients without a cookie jar, a header
+STICKY_READS_COOKIE = "read_primary"
+STICKY_READS_HEADER = "X-Read-Primary"
+
+
+def reads_primary(request: Request) -> bool:
+    """Whether the client wrote recently enough to read its writes."""
+    token = request.cookies.get(STICKY_READS_COOKIE) or request.headers.get(
+        STICKY_READS_HEADER
+    )
+    return read_router.replica is not None and read_router.is_sticky(token)
+
+
+async def get_db(request: Request, response: Response):
+    # Later reads by this client, on any process, stay on the primary for a
+    # while
+    if request.method not in SAFE_METHODS and read_router.replica is not None:
+        token = read_router.sticky_token()
+        response.set_cookie(
+            STICKY_READS_COOKIE,
+            token,
+            max_age=math.ceil(read_router.stickiness),
+            path=settings.API_PATH,
+            httponly=True,
+            samesite="lax",
+        )
+        response.headers[STICKY_READS_HEADER] = token
+    # Objects outlive the commit: responses are serialized after the route
+    # returns, where an expired attribute could no longer be lazily loaded.
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes, on the replica when there is one."""
+    async with await read_router.session(reads_primary(request)) as session:
         yield session
 
 
 TokenDep = Annotated[str, Depends(oauth2_scheme)]
-SessionDep = Annotated[Session, Depends(get_db)]
+SessionDep = Annotated[AsyncSession, Depends(get_db)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def decode_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
         token_data = TokenPayload(**payload)
-    except (JWTError, ValidationError):
+        int(token_data.sub)  # type: ignore
+    except (JWTError, ValidationError, TypeError, ValueError):
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Could not validate credentials")
-    user = val_user_response(session.get)(User, token_data.sub)  # type: ignore
+    return token_data
+
+
+async def get_current_user(session: SessionDep, token: TokenDep) -> AuthUser:
+    token_data = decode_token(token)
+    user_id = int(token_data.sub)  # type: ignore
+
+    # Cached snapshot first, then claims embedded in the token, and only
+    # then the database
+    user = user_cache.get(user_id)
+    if (
+        user is None
+        and token_data.act is not None
+        and token_data.iat is not None
+        and user_cache.trusts_claims(user_id, token_data.iat)
+    ):
+        user = AuthUser(
+            id=user_id, is_active=token_data.act, is_superuser=bool(token_data.su)
+        )
+    if user is None:
+        db_user = await val_user_response(session.get)(User, user_id)
+        user = AuthUser.model_validate(db_user)
+        user_cache.set(user_id, user)
+
+    if not user.is_active:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Inactive user")
     return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUser = Annotated[AuthUser, Depends(get_current_user)]
 
 
 def get_current_active_superuser(current_user: CurrentUser):
     if not current_user.is_superuser:
-        HTTPException(
+        raise HTTPException(
             status.HTTP_401_UNAUTHORIZED, "User doesn't have enough privileges"
         )
     return current_user
+
+
+async def get_metrics_reader(session: SessionDep, token: TokenDep):
+    """
+    Lets through METRICS_TOKEN, so scrapers don't need a user, or the
+    token of an active superuser.
+    """
+    if settings.METRICS_TOKEN and secrets.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        return
+    get_current_active_superuser(await get_current_user(session, token))
+
+
+def val_user_access(current_user: AuthUser, user_id: int):
+    if current_user.id != user_id and not current_user.is_superuser:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Not enough permissions")
+
+
+def client_key(request: Request) -> str:
+    """The user id of a valid bearer token, else the client's address."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{decode_token(token).sub}"
+        except HTTPException:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def has_own_rate_limit(route) -> bool:
+    """Whether `route` depends on a rate limit other than "default"."""
+    return any(
+        getattr(depends.dependency, "rate_limit", "default") != "default"
+        for depends in getattr(route, "dependencies", ())
+    )
+
+
+def rate_limit(name: str):
+    """
+    Dependency counting the request against the RATE_LIMITS entry `name`.
+    "default" is skipped on routes that have a limit of their own.
+    """
+
+    async def rate_limit_dep(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        if name == "default" and has_own_rate_limit(request.scope.get("route")):
+            return
+        retry_after = await rate_limiter.hit(name, client_key(request))
+        if retry_after:
+            raise HTTPException(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    rate_limit_dep.rate_limit = name  # type: ignore
+    return rate_limit_dep
@@ -0,0 +1,145 @@
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from sqlmodel import select
+
+from app.core.cache import feed_cache
+from app.core.events import broker
+from app.core.config import settings
+from app.core.similarity import PetQuery
+from app.db import crud, found
+from app.db.pagination import paginate
+from app.models import (
+    FoundPet,
+    Search,
+    SearchFilter,
+    SearchReadFeed,
+    SearchReadFound,
+    SearchReadNearby,
+)
+from app.api.deps import (
+    ListShape,
+    ReadSessionDep,
+    cached_page_response,
+    dump_list,
+    event_stream_response,
+    list_shape,
+    page_response,
+)
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    response_model=list[SearchReadFeed],
+)
+async def feed(
+    request: Request,
+    session: ReadSessionDep,
+    shape: Annotated[ListShape, Depends(list_shape(SearchReadFeed))],
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+):
+    async def render(response: Response) -> bytes:
+        searches = await page_response(paginate, response)(
+            session,
+            select(Search).options(*crud.SEARCH_READ_FEED_OPTIONS),
+            (Search.created_at, Search.id),
+            cursor=cursor,
+            skip=skip,
+            limit=limit,
+        )
+        return dump_list(SearchReadFeed, searches, shape)
+
+    return await cached_page_response(request, feed_cache, render)
+
+
+@router.get(
+    "/search",
+    response_model=list[SearchReadFeed],
+)
+async def feed_search(
+    request: Request,
+    session: ReadSessionDep,
+    search_filter: Annotated[SearchFilter, Depends()],
+    shape: Annotated[ListShape, Depends(list_shape(SearchReadFeed))],
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+):
+    async def render(response: Response) -> bytes:
+        statement = crud.build_search_query(session.bind.dialect.name, search_filter)
+        searches = await page_response(paginate, response)(
+            session,
+            statement,
+            (Search.created_at, Search.id),
+            cursor=cursor,
+            skip=skip,
+            limit=limit,
+        )
+        return dump_list(SearchReadFeed, searches, shape)
+
+    return await cached_page_response(request, feed_cache, render)
+
+
+@router.get(
+    "/nearby",
+    response_model=list[SearchReadNearby],
+)
+async def feed_nearby(
+    session: ReadSessionDep,
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    radius_km: float = Query(default=5, gt=0, le=200),
+    skip: int = 0,
+    limit: int = 10,
+):
+    nearby = await crud.get_nearby_searches(session, lat, lon, radius_km, skip, limit)
+    return [
+        SearchReadNearby.model_validate(search, update={"distance_km": distance})
+        for search, distance in nearby
+    ]
+
+
+@router.get(
+    "/found",
+    response_model=list[SearchReadFound],
+)
+async def feed_found(
+    session: ReadSessionDep,
+    found_pet: Annotated[FoundPet, Depends()],
+    limit: int = Query(default=10, gt=0, le=settings.FOUND_MAX_RESULTS),
+):
+    """
+    Active searches ranked by how well their pet matches an animal that
+    was found: same kind, then weighted by equal breed, fur color and
+    size, and by how close to `lat`, `lon` the pet was last seen.
+    """
+    if (found_pet.lat is None) != (found_pet.lon is None):
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, "lat and lon must be given together"
+        )
+    query = PetQuery(**found_pet.model_dump())
+    return await found.find_matches(session, query, limit)
+
+
+@router.get("/events")
+async def feed_events(last_event_id: str | None = Header(default=None)):
+    """
+    Server-sent events for new searches ("search") and sightings
+    ("sighting"), data being the JSON of the feed item or sighting.
+    Reconnecting with Last-Event-ID replays what was missed, or sends a
+    "reset" event if that's no longer possible.
+    """
+    return event_stream_response(broker.subscribe(last_event_id=last_event_id))
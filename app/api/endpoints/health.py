@@ -0,0 +1,28 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, status
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.engine import engine
+from app.models import Message
+
+router = APIRouter()
+
+
+@router.get("/live", response_model=Message)
+async def live():
+    """The process is up and serving. Doesn't touch the database."""
+    return Message(message="ok")
+
+
+@router.get("/ready", response_model=Message)
+async def ready():
+    """The process can serve traffic: the database answers in time."""
+    try:
+        async with asyncio.timeout(settings.HEALTH_DB_TIMEOUT_SECONDS):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    except Exception:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Database unavailable")
+    return Message(message="ok")
@@ -4,38 +4,44 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.db import crud
+from app.db import crud, jobs
 from app.core import security
 from app.core.config import settings
-from app.models import Message, NewPassword, Token, UserRead
-from ..deps import SessionDep, CurrentUser, val_user_response
+from app.models import Message, NewPassword, Token, User, UserRead
+from ..deps import SessionDep, CurrentUser, rate_limit, val_user_response
 
 router = APIRouter()
 
 
-@router.post("/token")
-def login_access_token(
+@router.post("/token", dependencies=[Depends(rate_limit("login"))])
+async def login_access_token(
     session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> Token:
-    user = val_user_response(crud.authenticate)(
+    user = await val_user_response(crud.authenticate)(
         session, form_data.username, form_data.password
     )
 
     token_expire = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = (
+        {"act": user.is_active, "su": user.is_superuser}
+        if settings.ACCESS_TOKEN_EMBED_CLAIMS
+        else None
+    )
     access_token = security.create_access_token(
-        user.id, expires_delta=token_expire  # type:ignore
+        user.id, expires_delta=token_expire, claims=claims  # type: ignore
     )
 
     return Token(access_token=access_token)
 
 
 @router.post("/test-token", response_model=UserRead)
-def test_token(current_user: CurrentUser):
-    return current_user
+async def test_token(session: SessionDep, current_user: CurrentUser):
+    return await session.get(User, current_user.id)
 
 
-@router.post("/password-recovery/{email}")
-def recover_password(session: SessionDep, email: str):
-    val_user_response(crud.get_user_by_email)(session, email)
-    # Mockado
+@router.post("/password-recovery/{email}", dependencies=[Depends(rate_limit("login"))])
+async def recover_password(session: SessionDep, email: str):
+    await val_user_response(crud.get_user_by_email)(session, email)
+    jobs.enqueue(session, "password_recovery", {"email": email})
+    await session.commit()
     return Message(message="Recovery email sent")
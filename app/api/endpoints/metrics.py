@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_metrics_reader
+from app.core.metrics import CONTENT_TYPE, render_text
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(get_metrics_reader)],
+)
+def read_metrics():
+    return PlainTextResponse(render_text(), media_type=CONTENT_TYPE)
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Response, status
+from sqlmodel import select
+
+from app.core.config import settings
+from app.db import crud
+from app.db.pagination import paginate
+from app.models import (
+    Message,
+    NewSubscription,
+    Notification,
+    NotificationRead,
+    Subscription,
+    SubscriptionRead,
+)
+from app.api.deps import CurrentUser, ReadSessionDep, SessionDep, page_response
+
+router = APIRouter()
+
+
+@router.get("/subscriptions", response_model=list[SubscriptionRead])
+async def read_subscriptions(session: ReadSessionDep, current_user: CurrentUser):
+    return await crud.get_subscriptions_by_user_id(session, current_user.id)
+
+
+@router.post("/subscriptions", response_model=SubscriptionRead)
+async def add_subscription(
+    session: SessionDep, current_user: CurrentUser, new_subscription: NewSubscription
+):
+    """Be notified of new searches and sightings inside an area."""
+    if new_subscription.radius_km > settings.SUBSCRIPTION_MAX_RADIUS_KM:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Radius is limited to {settings.SUBSCRIPTION_MAX_RADIUS_KM}km",
+        )
+    subscriptions = await crud.get_subscriptions_by_user_id(session, current_user.id)
+    if len(subscriptions) >= settings.SUBSCRIPTIONS_PER_USER:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Too many subscriptions")
+
+    return await crud.create_subscription(session, new_subscription, current_user.id)
+
+
+@router.delete("/subscriptions/{subscription_id}")
+async def remove_subscription(
+    subscription_id: int, session: SessionDep, current_user: CurrentUser
+):
+    subscription = await session.get(Subscription, subscription_id)
+    if (
+        subscription is None
+        or not subscription.is_active
+        or subscription.user_id != current_user.id
+    ):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Subscription not found")
+
+    await crud.delete_subscription(session, subscription)
+    return Message(message="Subscription removed")
+
+
+@router.get("/notifications", response_model=list[NotificationRead])
+async def read_notifications(
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    response: Response,
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+):
+    return await page_response(paginate, response)(
+        session,
+        select(Notification).where(Notification.user_id == current_user.id),
+        (Notification.created_at, Notification.id),
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+    )
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, status, File, UploadFile
+from typing import Any
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Form,
+    HTTPException,
+    status,
+    File,
+    UploadFile,
+)
 
 from app.db import crud
 from app.models import (
     Message,
     NewPet,
     Pet,
+    PetBatchResult,
     PetRead,
     PetReadWSearch,
     PetReadWUserSearch,
@@ -12,8 +24,11 @@ from app.models import (
 )
 from app.api.deps import (
     CurrentUser,
+    ReadSessionDep,
     SessionDep,
     get_current_user,
+    list_response,
+    val_batch,
     val_pet_response,
     val_user_response,
 )
@@ -26,9 +41,10 @@ router = APIRouter()
     dependencies=[Depends(get_current_user)],
     response_model=list[PetReadWSearch],
 )
-async def read_user_pets(user_id: int, session: SessionDep):
-    user = val_user_response(session.get)(User, user_id)  # type: ignore
-    return user.pets
+async def read_user_pets(user_id: int, session: ReadSessionDep):
+    await val_user_response(session.get)(User, user_id)  # type: ignore
+    pets = await crud.get_pets_by_user_id(session, user_id)
+    return list_response(PetReadWSearch, pets)
 
 
 @router.post("/", response_model=PetRead)
@@ -38,20 +54,34 @@ async def add_pet(
     current_user: CurrentUser,
     new_pet: NewPet,
 ):
-    val_user_response(session.get, current_user.id)(User, user_id)  # type: ignore
+    await val_user_response(session.get, current_user.id)(User, user_id)  # type: ignore
 
-    pet = crud.create_pet(session, new_pet, user_id)
+    pet = await crud.create_pet(session, new_pet, user_id)
     return pet
 
 
+@router.post("/batch", response_model=PetBatchResult)
+async def add_pets(
+    user_id: int,
+    session: SessionDep,
+    current_user: CurrentUser,
+    new_pets: list[Any] = Body(),
+):
+    await val_user_response(session.get, current_user.id)(User, user_id)  # type: ignore
+
+    valid, errors = val_batch(NewPet, new_pets)
+    pets = await crud.create_pets(session, valid, user_id)
+    return PetBatchResult(created=pets, errors=errors)  # type: ignore
+
+
 @router.get(
     "/{pet_id}",
     dependencies=[Depends(get_current_user)],
     response_model=PetRead,
 )
-async def read_pet_by_id(user_id: int, pet_id: int, session: SessionDep):
-    val_user_response(session.get)(User, user_id)  # type: ignore
-    pet = val_pet_response(session.get, user_id)(Pet, pet_id)  # type: ignore
+async def read_pet_by_id(user_id: int, pet_id: int, session: ReadSessionDep):
+    await val_user_response(session.get)(User, user_id)  # type: ignore
+    pet = await val_pet_response(session.get, user_id)(Pet, pet_id)  # type: ignore
     return pet
 
 
@@ -59,10 +89,9 @@ async def read_pet_by_id(user_id: int, pet_id: int, session: SessionDep):
 async def remove_pet(
     user_id: int, pet_id: int, current_user: CurrentUser, session: SessionDep
 ):
-    val_user_response(session.get)(User, user_id)  # type: ignore
-    pet = val_pet_response(session.get, current_user.id)(Pet, pet_id)  # type: ignore
-    session.delete(pet)
-    session.commit()
+    await val_user_response(session.get)(User, user_id)  # type: ignore
+    pet = await val_pet_response(session.get, current_user.id)(Pet, pet_id)  # type: ignore
+    await crud.delete_pet(session, pet)
 
     return Message(message="Pet deleted successfully")
 
@@ -71,8 +100,8 @@ async def remove_pet(
 async def delete_pet(
     user_id: int, pet_id: int, session: SessionDep, current_user: CurrentUser
 ) -> Message:
-    user = val_user_response(session.get)(User, user_id)  # type: ignore
-    pet = val_pet_response(session.get, user.id)(Pet, pet_id)  # type: ignore
+    user = await val_user_response(session.get)(User, user_id)  # type: ignore
+    pet = await val_pet_response(session.get, user.id)(Pet, pet_id)  # type: ignore
 
     if not current_user.is_superuser:
         raise HTTPException(
@@ -84,6 +113,5 @@ async def delete_pet(
             detail="Pet does not belong to marked user",
         )
 
-    session.delete(pet)
-    session.commit()
+    await crud.delete_pet(session, pet)
     return Message(message="Pet deleted successfully")
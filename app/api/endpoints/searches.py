@@ -1,21 +1,32 @@
-from fastapi import APIRouter
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Body, Depends, Response
 from sqlmodel import select
 
 from app.db import crud
+from app.db.pagination import paginate
 from app.models import (
     SearchUpdate,
-    User,
     Pet,
     NewSearch,
+    NewSighting,
     Search,
+    SearchBatchResult,
     SearchReadWAll,
+    SightingBatchResult,
 )
 from app.api.deps import (
     CurrentUser,
+    ListShape,
+    ReadSessionDep,
     SessionDep,
+    list_response,
+    list_shape,
+    page_response,
+    val_batch,
     val_pet_response,
     val_search_response,
-    val_user_response,
+    val_user_access,
 )
 
 router = APIRouter()
@@ -28,16 +39,25 @@ router = APIRouter()
 async def get_searches_by_user_id(
     user_id: int,
     current_user: CurrentUser,
-    session: SessionDep,
+    session: ReadSessionDep,
+    response: Response,
+    shape: Annotated[ListShape, Depends(list_shape(SearchReadWAll))],
+    cursor: str | None = None,
     skip: int = 0,
     limit: int = 10,
 ):
-    val_user_response(session.get, user_id)(User, current_user.id)  # type: ignore
-    statement = (
-        select(Search).where(Search.user_id == user_id).offset(skip).limit(limit)
+    val_user_access(current_user, user_id)
+    searches = await page_response(paginate, response)(
+        session,
+        select(Search)
+        .where(Search.user_id == user_id)
+        .options(*crud.SEARCH_READ_W_ALL_OPTIONS),
+        (Search.created_at, Search.id),
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
     )
-    searches = session.exec(statement).all()
-    return searches
+    return list_response(SearchReadWAll, searches, response, shape)
 
 
 @router.post("/{pet_id}", response_model=SearchReadWAll)
@@ -48,13 +68,29 @@ async def create_search_by_pet_id(
     session: SessionDep,
     new_search: NewSearch,
 ):
-    val_user_response(session.get, user_id)(User, current_user.id)  # type: ignore
-    val_pet_response(session.get, user_id)(Pet, pet_id)  # type: ignore
-    search = crud.create_search(session, new_search, user_id, pet_id)
+    val_user_access(current_user, user_id)
+    await val_pet_response(session.get, user_id)(Pet, pet_id)  # type: ignore
+    search = await crud.create_search(session, new_search, user_id, pet_id)
 
     return search
 
 
+@router.post("/{pet_id}/batch", response_model=SearchBatchResult)
+async def create_searches_by_pet_id(
+    user_id: int,
+    pet_id: int,
+    current_user: CurrentUser,
+    session: SessionDep,
+    new_searches: list[Any] = Body(),
+):
+    val_user_access(current_user, user_id)
+    await val_pet_response(session.get, user_id)(Pet, pet_id)  # type: ignore
+
+    valid, errors = val_batch(NewSearch, new_searches)
+    searches = await crud.create_searches(session, valid, user_id, pet_id)
+    return SearchBatchResult(created=searches, errors=errors)  # type: ignore
+
+
 @router.put("/{pet_id}/{search_id}", response_model=SearchReadWAll)
 async def update_search_by_pet_id(
     user_id: int,
@@ -64,12 +100,33 @@ async def update_search_by_pet_id(
     session: SessionDep,
     update_search: SearchUpdate,
 ):
-    val_user_response(session.get, user_id)(User, current_user.id)  # type: ignore
-    val_pet_response(session.get)(Pet, pet_id)  # type: ignore
-    search = val_search_response(session.get, pet_id)(Search, search_id)  # type: ignore
+    val_user_access(current_user, user_id)
+    await val_pet_response(session.get)(Pet, pet_id)  # type: ignore
+    search = await val_search_response(session.get, pet_id)(Search, search_id)  # type: ignore
 
-    search = crud.update_search(
+    search = await crud.update_search(
         session,
         search,
         update_search,
     )
+    return search
+
+
+@router.post(
+    "/{pet_id}/{search_id}/sightings/batch", response_model=SightingBatchResult
+)
+async def add_sightings(
+    user_id: int,
+    pet_id: int,
+    search_id: int,
+    current_user: CurrentUser,
+    session: SessionDep,
+    new_sightings: list[Any] = Body(),
+):
+    val_user_access(current_user, user_id)
+    await val_pet_response(session.get, user_id)(Pet, pet_id)  # type: ignore
+    await val_search_response(session.get, pet_id)(Search, search_id)  # type: ignore
+
+    valid, errors = val_batch(NewSighting, new_sightings)
+    sightings = await crud.create_sightings(session, valid, search_id)
+    return SightingBatchResult(created=sightings, errors=errors)  # type: ignore
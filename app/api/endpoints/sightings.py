@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Header, Response
+from sqlmodel import select
+
+from app.core.events import broker
+from app.db.pagination import paginate
+from app.models import Search, Sighting, SightingRead
+from app.api.deps import (
+    ReadSessionDep,
+    event_stream_response,
+    page_response,
+    val_search_response,
+)
+
+router = APIRouter()
+
+
+@router.get(
+    "/{search_id}/sightings",
+    response_model=list[SightingRead],
+)
+async def read_search_sightings(
+    search_id: int,
+    session: ReadSessionDep,
+    response: Response,
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+):
+    await val_search_response(session.get)(Search, search_id)  # type: ignore
+    sightings = await page_response(paginate, response)(
+        session,
+        select(Sighting).where(Sighting.search_id == search_id),
+        (Sighting.datetime, Sighting.id),
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+    )
+    return sightings
+
+
+@router.get("/{search_id}/events")
+async def search_events(
+    search_id: int,
+    session: ReadSessionDep,
+    last_event_id: str | None = Header(default=None),
+):
+    """The sightings of one search as they are reported, see /feed/events."""
+    await val_search_response(session.get)(Search, search_id)  # type: ignore
+    # Give the connection back, the stream may stay open for hours
+    await session.close()
+    subscription = broker.subscribe(search_id, last_event_id)
+    return event_stream_response(subscription)
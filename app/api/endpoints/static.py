@@ -0,0 +1,182 @@
+import os
+import re
+from typing import AsyncIterator
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+
+from app.core import storage
+from app.core.config import settings
+from app.db import jobs
+from app.models import ImageRead
+from app.api.deps import SessionDep, etag_matches, get_current_user
+
+router = APIRouter()
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# Room for the multipart boundary and part headers around the image
+MULTIPART_OVERHEAD = 16 * 1024
+
+UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+async def upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(CHUNK_SIZE):
+        yield chunk
+
+
+@router.post(
+    "/images",
+    dependencies=[Depends(get_current_user)],
+    response_model=ImageRead,
+    openapi_extra=UPLOAD_BODY,
+)
+async def upload_image(request: Request, session: SessionDep):
+    """Uploads a JPEG, PNG, WebP or GIF image as the multipart field "file"."""
+    # Checked before reading the body, which Starlette spools whole while
+    # parsing the form. The server holds the body to its Content-Length
+    length = request.headers.get("content-length", "")
+    if not length.isdigit():
+        raise HTTPException(status.HTTP_411_LENGTH_REQUIRED, "Content-Length required")
+    if int(length) > settings.IMAGE_MAX_BYTES + MULTIPART_OVERHEAD:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Image is too large"
+        )
+
+    async with request.form(max_files=1, max_fields=1) as form:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(
+                status.HTTP_422_UNPROCESSABLE_ENTITY, "The file field is required"
+            )
+        try:
+            image_id = await storage.store_image(upload_chunks(file))
+        except storage.ImageTooLarge:
+            raise HTTPException(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Image is too large"
+            )
+        except storage.UnsupportedImage:
+            raise HTTPException(
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Unsupported image type"
+            )
+    jobs.enqueue(session, "make_thumbnails", {"image_id": image_id})
+    await session.commit()
+
+    url = request.url_for("read_image", image_id=image_id)
+    return ImageRead(id=image_id, url=str(url))
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Single "bytes=" range as inclusive (start, end). Returns None for a
+    header to ignore, such as several ranges, and raises
+    RangeNotSatisfiable for a range past the end of the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match[1] == match[2] == "":
+        return None
+    if match[1] == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(match[2]), 0), size - 1
+    else:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+    if start > end or start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+async def file_chunks(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@router.get("/images/{image_id}", name="read_image")
+async def read_image(request: Request, image_id: str, w: int | None = None):
+    parsed = storage.parse_image_id(image_id)
+    if not parsed:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Image not found")
+    digest, ext = parsed
+    if w is not None and w not in settings.IMAGE_THUMBNAIL_WIDTHS:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported width")
+
+    path = storage.image_path(digest, ext, w)
+    # Content addressed files never change, except that a variant still
+    # being generated is served from the original for a little while
+    cache_control = "public, max-age=31536000, immutable"
+    if w is not None and not await anyio.Path(path).exists():
+        path = storage.image_path(digest, ext)
+        cache_control = "public, max-age=60"
+        w = None
+    try:
+        size = (await anyio.Path(path).stat()).st_size
+    except FileNotFoundError:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Image not found")
+
+    headers = {
+        "ETag": f'"{digest}-{w or 0}"',
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        # Browsers must not second-guess the type sniffed at upload
+        "X-Content-Type-Options": "nosniff",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    start, end = 0, size - 1
+    status_code = status.HTTP_200_OK
+    range_header = request.headers.get("range")
+    if (
+        range_header
+        and size
+        and request.headers.get("if-range", headers["ETag"]) == headers["ETag"]
+    ):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+        # Multiple or malformed ranges are ignored, and the whole file sent
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        file_chunks(os.fspath(path), start, length),
+        status_code=status_code,
+        media_type=storage.MEDIA_TYPES[ext],
+        headers=headers,
+    )
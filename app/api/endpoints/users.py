@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlmodel import select
 
 from app.db import crud
+from app.db.pagination import paginate
 from app.models import (
     Message,
     UserCreate,
@@ -13,39 +14,48 @@ from app.models import (
 )
 from app.api.deps import (
     CurrentUser,
+    ReadSessionDep,
     SessionDep,
     get_current_active_superuser,
     get_current_user,
+    list_response,
+    page_response,
+    rate_limit,
     val_user_response,
 )
 
 router = APIRouter()
 
 
-@router.post("/open", response_model=UserRead)
+@router.post(
+    "/open",
+    response_model=UserRead,
+    dependencies=[Depends(rate_limit("signup"))],
+)
 async def create_user_open(session: SessionDep, user_in: UserCreateOpen):
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="User already exists",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, to_create=user_create)
+    user = await crud.create_user(session=session, to_create=user_create)
     return user
 
 
 @router.get("/me", response_model=UserReadWSearchPet)
-async def read_user_me(current_user: CurrentUser):
-    return current_user
+async def read_user_me(session: ReadSessionDep, current_user: CurrentUser):
+    return await crud.get_user_w_search_pet(session, current_user.id)  # type: ignore
 
 
 @router.put("/me", response_model=UserReadWSearchPet)
 async def update_user_me(
     session: SessionDep, user_in: UserUpdate, current_user: CurrentUser
 ):
-    user = crud.update_user(session, current_user, user_in)
-    return user
+    user = await session.get(User, current_user.id)
+    await crud.update_user(session, user, user_in)  # type: ignore
+    return await crud.get_user_w_search_pet(session, current_user.id)  # type: ignore
 
 
 @router.get(
@@ -53,8 +63,8 @@ async def update_user_me(
     dependencies=[Depends(get_current_user)],
     response_model=UserReadWSearchPet,
 )
-async def read_user_by_id(user_id: int, session: SessionDep):
-    user = val_user_response(session.get)(User, user_id)  # type: ignore
+async def read_user_by_id(user_id: int, session: ReadSessionDep):
+    user = await val_user_response(crud.get_user_w_search_pet)(session, user_id)
     return user
 
 
@@ -63,22 +73,29 @@ async def read_user_by_id(user_id: int, session: SessionDep):
     dependencies=[Depends(get_current_user)],
     response_model=list[UserRead],
 )
-async def get_users(session: SessionDep, skip: int = 0, limit: int = 100):
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
-    return users
+async def get_users(
+    session: ReadSessionDep,
+    response: Response,
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+):
+    users = await page_response(paginate, response)(
+        session, select(User), (User.id,), cursor=cursor, skip=skip, limit=limit
+    )
+    return list_response(UserRead, users, response)
 
 
 @router.post("/", dependencies=[Depends(get_current_active_superuser)])
 async def create_user(*, session: SessionDep, to_create: UserCreate):
-    user = crud.get_user_by_email(session=session, email=to_create.email)
+    user = await crud.get_user_by_email(session=session, email=to_create.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, to_create=to_create)
+    user = await crud.create_user(session=session, to_create=to_create)
     return user
 
 
@@ -93,13 +110,13 @@ async def update_user(
     user_id: int,
     user_in: UserUpdate,
 ):
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=404,
             detail="No user with this username",
         )
-    user = crud.update_user(session, user, user_in)
+    user = await crud.update_user(session, user, user_in)
     return user
 
 
@@ -107,19 +124,16 @@ async def update_user(
 async def deactivate_user(
     session: SessionDep, current_user: CurrentUser, user_id: int
 ) -> Message:
-    user = val_user_response(session.get)(User, user_id)  # type: ignore
+    user = await val_user_response(session.get)(User, user_id)  # type: ignore
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not enough permissions"
         )
-    if user == current_user:
+    if user.id == current_user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Users are not allowed to delete themselves",
         )
 
-    user.is_active = False
-
-    session.add(user)
-    session.commit()
+    await crud.deactivate_user(session, user)
     return Message(message="User deleted successfully")
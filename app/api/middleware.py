@@ -0,0 +1,438 @@
+import asyncio
+import cProfile
+import hashlib
+import json
+import logging
+import time
+from typing import Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.deps import client_key
+from app.core import profiling
+from app.core.compression import Compressor, negotiate
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+from app.db.idempotency import idempotency_store
+from app.db.instrumentation import QueryStats, track_queries
+
+__all__ = [
+    "RequestMetricsMiddleware",
+    "ConcurrencyLimitMiddleware",
+    "IdempotencyMiddleware",
+    "CompressionMiddleware",
+]
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Requests handled, by route template and response status",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last of its response",
+    ("method", "route"),
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per request",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL statements per request",
+    ("method", "route"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests holding a concurrency slot"
+)
+HTTP_RESPONSE_COMPRESSED = Counter(
+    "http_responses_compressed_total", "Responses compressed, by coding", ("coding",)
+)
+HTTP_REQUESTS_SHED = Counter(
+    "http_requests_shed_total", "Requests refused for lack of a concurrency slot"
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Requests sent with an Idempotency-Key, by outcome",
+    ("outcome",),
+)
+
+
+def is_event_stream(message: Message) -> bool:
+    headers = dict(message.get("headers", ()))
+    return headers.get(b"content-type", b"").startswith(b"text/event-stream")
+
+
+async def send_json(
+    send: Send,
+    status_code: int,
+    detail: str,
+    headers: Sequence[tuple[bytes, bytes]] = (),
+):
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def route_template(scope: Scope) -> str:
+    # Set by the router on a match; templates keep the label set bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency and DB usage per route into the http_* metrics, logs
+    requests slower than SLOW_REQUEST_SECONDS and profiles a sample of
+    them (see app.core.profiling). Event streams stay open by design, so
+    only their status is recorded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        streaming = False
+        profiler = profiling.start_profile()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, streaming, profiler
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                streaming = is_event_stream(message)
+                if streaming and profiler is not None:
+                    profiling.stop_profile(profiler)
+                    profiler = None
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with track_queries() as queries:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            method, route = scope["method"], route_template(scope)
+
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
+            if not streaming:
+                self.record(scope, route, duration, queries, profiler)
+
+    def record(
+        self,
+        scope: Scope,
+        route: str,
+        duration: float,
+        queries: QueryStats,
+        profiler: cProfile.Profile | None,
+    ):
+        method = scope["method"]
+        HTTP_REQUEST_DURATION.observe(duration, method=method, route=route)
+        HTTP_REQUEST_DB_STATEMENTS.observe(queries.count, method=method, route=route)
+        HTTP_REQUEST_DB_DURATION.observe(queries.seconds, method=method, route=route)
+
+        profile_path = None
+        if profiler is not None:
+            profile_path = profiling.finish_profile(
+                profiler, duration, f"{method} {route}"
+            )
+        if duration >= settings.SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request %s %s: %.3fs, %d statements in %.3fs%s",
+                method,
+                scope["path"],
+                duration,
+                queries.count,
+                queries.seconds,
+                f", profile at {profile_path}" if profile_path else "",
+            )
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Admits at most MAX_CONCURRENT_REQUESTS requests at once. Others wait
+    up to ADMISSION_TIMEOUT_SECONDS for a slot and are then refused with a
+    503, so a burst is shed up front instead of queueing on the DB pool
+    until every request times out. Health checks and metrics bypass it,
+    and event streams give their slot back once they start.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        limit = settings.MAX_CONCURRENT_REQUESTS
+        self.slots = asyncio.Semaphore(limit) if limit > 0 else None
+        self.exempt = tuple(
+            f"{settings.API_PATH}{prefix}" for prefix in ("/health", "/metrics")
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            self.slots is None
+            or scope["type"] != "http"
+            or scope["path"].startswith(self.exempt)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await asyncio.wait_for(
+                self.slots.acquire(), settings.ADMISSION_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            HTTP_REQUESTS_SHED.inc()
+            await send_json(
+                send, 503, "Server busy, try again shortly", [(b"retry-after", b"1")]
+            )
+            return
+
+        held = True
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+
+        def release():
+            nonlocal held
+            if held:
+                held = False
+                self.slots.release()
+                HTTP_REQUESTS_IN_FLIGHT.dec()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and is_event_stream(message):
+                release()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
+
+
+class IdempotencyMiddleware:
+    """
+    Makes POST and PATCH requests with a JSON body sent with an
+    Idempotency-Key header safe to retry. The first response under a key
+    is stored (see app.db.idempotency), and a retry of the same request
+    gets it back with Idempotent-Replayed: true, without the route running
+    again. A retry while the first request is still running gets a 409,
+    and reusing a key for a different request a 422. Keys are per client
+    (deps.client_key).
+
+    Only successes and 4xx that a retry would get again are stored. After
+    a 5xx, or a status that depends on the moment or the credentials
+    (RETRYABLE_STATUSES), the key is freed and a retry runs the request.
+    Other bodies, such as image uploads, are passed through untouched, and
+    JSON bodies over IDEMPOTENCY_MAX_BODY_BYTES are refused with a 413, as
+    they're read whole to be fingerprinted.
+    """
+
+    METHODS = frozenset({"POST", "PATCH"})
+    MAX_KEY_LENGTH = 255
+    # Unauthorized, forbidden, timed out, conflicting, rate limited
+    RETRYABLE_STATUSES = frozenset({401, 403, 408, 409, 429})
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        header = None
+        if scope["type"] == "http" and scope["method"] in self.METHODS:
+            request_headers = Headers(scope=scope)
+            content_type = request_headers.get("content-type", "")
+            if content_type.startswith("application/json"):
+                header = request_headers.get("idempotency-key")
+        if header is None:
+            await self.app(scope, receive, send)
+            return
+        if not header or len(header) > self.MAX_KEY_LENGTH:
+            await send_json(
+                send,
+                400,
+                f"Idempotency-Key must have 1 to {self.MAX_KEY_LENGTH} characters",
+            )
+            return
+
+        # The whole body is read to fingerprint it, then handed to the route
+        fingerprint = hashlib.sha256(
+            f"{scope['method']} {scope['path']}?".encode() + scope["query_string"]
+        )
+        limit = settings.IDEMPOTENCY_MAX_BODY_BYTES
+        too_large = f"Bodies sent with an Idempotency-Key are limited to {limit} bytes"
+        length = request_headers.get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            await send_json(send, 413, too_large)
+            return
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            fingerprint.update(chunks[-1])
+            size += len(chunks[-1])
+            if size > limit:
+                await send_json(send, 413, too_large)
+                return
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        key = f"{client_key(Request(scope))}:{header}"
+        held = await idempotency_store.claim(key, fingerprint.hexdigest())
+        if held is not None:
+            if held.fingerprint != fingerprint.hexdigest():
+                IDEMPOTENT_REQUESTS.inc(outcome="mismatch")
+                await send_json(
+                    send, 422, "Idempotency-Key was used for a different request"
+                )
+            elif held.status_code is None:
+                IDEMPOTENT_REQUESTS.inc(outcome="in_progress")
+                await send_json(
+                    send,
+                    409,
+                    "A request with this Idempotency-Key is in progress",
+                    [(b"retry-after", b"1")],
+                )
+            else:
+                IDEMPOTENT_REQUESTS.inc(outcome="replayed")
+                await self.replay(send, held.status_code, held.headers or [], held.body)
+            return
+
+        consumed = False
+
+        async def receive_body() -> Message:
+            nonlocal consumed
+            if consumed:
+                return await receive()
+            consumed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status_code = 500
+        headers: list[list[str]] = []
+        response: list[bytes] = []
+        storable = True
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, headers, storable
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [
+                    [k.decode("latin-1"), v.decode("latin-1")]
+                    for k, v in message["headers"]
+                ]
+                storable = not is_event_stream(message)
+            elif message["type"] == "http.response.body" and storable:
+                response.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_wrapper)
+        except Exception:
+            await idempotency_store.release(key)
+            raise
+        if status_code >= 500 or status_code in self.RETRYABLE_STATUSES or not storable:
+            # Not worth replaying: a retry runs the request again
+            IDEMPOTENT_REQUESTS.inc(outcome="released")
+            await idempotency_store.release(key)
+        else:
+            IDEMPOTENT_REQUESTS.inc(outcome="stored")
+            await idempotency_store.save(key, status_code, headers, b"".join(response))
+
+    async def replay(
+        self, send: Send, status_code: int, headers: list[list[str]], body: bytes | None
+    ):
+        raw_headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        raw_headers.append((b"idempotent-replayed", b"true"))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": raw_headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": body or b""})
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON and text responses in the coding the client prefers
+    (see app.core.compression), when sent in several chunks or at least
+    COMPRESSION_MIN_BYTES at once. Event streams and bodies that are
+    already encoded are passed through. A compressed response's ETag is
+    made weak, as its bytes differ from the identity body's.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @staticmethod
+    def compressible(headers: Headers) -> bool:
+        content_type = headers.get("content-type", "")
+        return "content-encoding" not in headers and (
+            content_type.startswith("application/json")
+            or (
+                content_type.startswith("text/")
+                and not content_type.startswith("text/event-stream")
+            )
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start: Message | None = None
+        compressor: Compressor | None = None
+
+        async def send_wrapper(message: Message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                if self.compressible(Headers(raw=message["headers"])):
+                    # Held until the body shows whether it's worth it
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                headers = MutableHeaders(raw=list(start["headers"]))
+                headers.add_vary_header("Accept-Encoding")
+                body = message.get("body", b"")
+                more = message.get("more_body", False)
+                if coding and (more or len(body) >= settings.COMPRESSION_MIN_BYTES):
+                    compressor = Compressor(coding)
+                    body = compressor.compress(body, final=not more)
+                    headers["content-encoding"] = coding
+                    del headers["content-length"]
+                    if not more:
+                        headers["content-length"] = str(len(body))
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["etag"] = f"W/{etag}"
+                    HTTP_RESPONSE_COMPRESSED.inc(coding=coding)
+                await send({**start, "headers": headers.raw})
+                start = None
+                message = {**message, "body": body}
+            elif message["type"] == "http.response.body" and compressor is not None:
+                more = message.get("more_body", False)
+                body = compressor.compress(message.get("body", b""), final=not more)
+                message = {**message, "body": body}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Protocol, TypeVar
+
+from app.core.config import settings
+
+__all__ = [
+    "TTLCache",
+    "UserCache",
+    "user_cache",
+    "CacheBackend",
+    "MemoryCacheBackend",
+    "CachedPage",
+    "PageCache",
+    "feed_cache",
+]
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    In-process LRU cache whose entries also expire `ttl` seconds after
+    being set. Lookups and writes are O(1).
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= self._timer():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V):
+        with self._lock:
+            self._data[key] = (self._timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[1] if item else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserCache(TTLCache[int, V]):
+    """
+    Authenticated user snapshots keyed by user id. Embedded token claims
+    are only trusted for `claims_max_age` seconds after the token was
+    issued, after which the user is looked up again. Invalidating a user
+    also records when it happened, so that within this process, tokens
+    issued before the change stop being trusted at once.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, claims_max_age: float):
+        super().__init__(maxsize, ttl)
+        self.claims_max_age = claims_max_age
+        self._invalidated_at: TTLCache[int, float] = TTLCache(maxsize, claims_max_age)
+
+    def invalidate(self, user_id: int):
+        self.pop(user_id)
+        self._invalidated_at.set(user_id, time.time())
+
+    def trusts_claims(self, user_id: int, issued_at: float) -> bool:
+        if time.time() - issued_at > self.claims_max_age:
+            return False
+        invalidated_at = self._invalidated_at.get(user_id)
+        return invalidated_at is None or issued_at > invalidated_at
+
+
+user_cache: UserCache = UserCache(
+    settings.USER_CACHE_MAX_SIZE,
+    settings.USER_CACHE_TTL_SECONDS,
+    settings.ACCESS_TOKEN_CLAIMS_MAX_AGE_SECONDS,
+)
+
+
+class CacheBackend(Protocol):
+    """
+    Storage for PageCache. Values are opaque bytes so a shared cache server
+    can implement it as well as the in-process MemoryCacheBackend.
+    """
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl: float): ...
+
+    async def clear(self): ...
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache[str, bytes] = TTLCache(maxsize, ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._cache.set(key, value)
+
+    async def clear(self):
+        self._cache.clear()
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    body: bytes
+    etag: str
+    headers: dict[str, str]
+
+    @classmethod
+    def build(cls, body: bytes, headers: dict[str, str] | None = None):
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return cls(body, etag, headers or {})
+
+    def dumps(self) -> bytes:
+        meta = json.dumps({"etag": self.etag, "headers": self.headers})
+        return meta.encode() + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes):
+        meta, body = raw.split(b"\n", 1)
+        fields = json.loads(meta)
+        return cls(body, fields["etag"], fields["headers"])
+
+
+class PageCache:
+    """
+    Serialized response pages keyed by request. Writers call invalidate()
+    after committing; a page computed while an invalidation happened is not
+    stored, so a slow reader can't put stale data back.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.generation = 0
+
+    async def get(self, key: str) -> CachedPage | None:
+        raw = await self.backend.get(key)
+        return CachedPage.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, page: CachedPage, generation: int):
+        if generation == self.generation:
+            await self.backend.set(key, page.dumps(), self.ttl)
+
+    async def invalidate(self):
+        self.generation += 1
+        await self.backend.clear()
+
+
+feed_cache = PageCache(
+    MemoryCacheBackend(settings.FEED_CACHE_MAX_SIZE, settings.FEED_CACHE_TTL_SECONDS),
+    settings.FEED_CACHE_TTL_SECONDS,
+)
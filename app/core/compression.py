@@ -0,0 +1,58 @@
+import zlib
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered without brotli
+    brotli = None
+
+__all__ = ["ENCODINGS", "negotiate", "Compressor"]
+
+# Offered content codings, preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """
+    The offered coding with the highest q-value in an Accept-Encoding
+    header, the preferred one on ties, or None to send the body as is.
+    """
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0
+        if coding.strip():
+            accepted[coding.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for coding in ENCODINGS:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class Compressor:
+    """Incremental compressor of a response body in one of ENCODINGS."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)  # type: ignore
+            self._compress, self._flush = compressor.process, compressor.finish
+        else:
+            # wbits 31: a gzip header and trailer around the deflate stream
+            compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress, self._flush = compressor.compress, compressor.flush
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        """Compresses the next chunk, ending the stream if `final`."""
+        chunk = self._compress(data)
+        return chunk + self._flush() if final else chunk
@@ -32,10 +32,142 @@ class Settings(BaseSettings):
     PROJECT_NAME: str
 
     STATIC_PATH: Path = Path().absolute().joinpath("static")
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024
+    # Widths of the downscaled variants generated for each uploaded image
+    IMAGE_THUMBNAIL_WIDTHS: list[int] = [160, 640]
 
     API_PATH: str = "/api"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 3
+    # Embed is_active/is_superuser in access tokens so authenticated requests
+    # skip the user lookup. Claims are trusted for up to
+    # ACCESS_TOKEN_CLAIMS_MAX_AGE_SECONDS after the token was issued. Changes
+    # made through this process revoke them at once, but the cache is per
+    # process: other workers keep trusting a deactivated or demoted user's
+    # claims for up to that long, then their cached snapshot for up to
+    # USER_CACHE_TTL_SECONDS
+    ACCESS_TOKEN_EMBED_CLAIMS: bool = False
+    ACCESS_TOKEN_CLAIMS_MAX_AGE_SECONDS: int = 60
+
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10_000
+
+    # Token buckets per group of routes, "<requests>/<second|minute|hour|day>":
+    # a client may burst up to <requests>, refilled evenly over the period.
+    # Clients are told apart by the user id in their token, else their IP
+    # (behind a proxy, the one it forwards: see gunicorn.conf.py). Routes
+    # with a limit of their own don't also count against "default". Many
+    # users may share an IP behind a NAT, so "signup" is only a brake
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: dict[str, str] = {
+        "default": "300/minute",
+        "login": "10/minute",
+        "signup": "30/hour",
+        "feed": "120/minute",
+    }
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+
+    # Requests handled at once per process; beyond it requests wait up to
+    # ADMISSION_TIMEOUT_SECONDS for a slot, then get a 503. 0 disables
+    MAX_CONCURRENT_REQUESTS: int = 100
+    ADMISSION_TIMEOUT_SECONDS: float = 0.5
+
+    # Background jobs (app.db.jobs), run by JOB_WORKERS tasks per process,
+    # 0 to only enqueue. A failed job is retried with exponential backoff
+    # from JOB_RETRY_BACKOFF_SECONDS up to JOB_RETRY_MAX_SECONDS, and given
+    # up after JOB_MAX_ATTEMPTS. Jobs are cancelled after JOB_TIMEOUT_SECONDS
+    JOB_WORKERS: int = 2
+    JOB_POLL_SECONDS: float = 5
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF_SECONDS: float = 5
+    JOB_RETRY_MAX_SECONDS: float = 600
+    JOB_TIMEOUT_SECONDS: float = 300
+
+    # Nearby notifications: users subscribe to up to SUBSCRIPTIONS_PER_USER
+    # areas of at most SUBSCRIPTION_MAX_RADIUS_KM. Subscriptions are held in
+    # memory on a grid of geohash cells at SUBSCRIPTION_GRID_PRECISION (5 is
+    # about 5km x 5km), and matches are written to the outbox
+    # NOTIFICATION_BATCH_SIZE rows per INSERT
+    SUBSCRIPTIONS_PER_USER: int = 5
+    SUBSCRIPTION_MAX_RADIUS_KM: float = 20
+    SUBSCRIPTION_GRID_PRECISION: int = 5
+    NOTIFICATION_BATCH_SIZE: int = 1000
+
+    # /feed/found ranks active searches against a found animal: attributes
+    # score their weight when equal, half of it when unknown on either side,
+    # and "distance" decays by a factor of e every FOUND_DISTANCE_SCALE_KM.
+    # Each process syncs its in-memory index at most every
+    # FOUND_INDEX_SYNC_SECONDS
+    FOUND_WEIGHTS: dict[str, float] = {
+        "breed": 3,
+        "fur_color": 2,
+        "size": 1,
+        "distance": 4,
+    }
+    FOUND_DISTANCE_SCALE_KM: float = 10
+    FOUND_MAX_RESULTS: int = 50
+    FOUND_INDEX_SYNC_SECONDS: float = 1
+
+    # Responses to POST and PATCH requests sent with an Idempotency-Key are
+    # kept IDEMPOTENCY_TTL_SECONDS, and a retry with the same key gets them
+    # back instead of writing again. A key whose first request has not
+    # finished after IDEMPOTENCY_LOCK_SECONDS may be taken over by a retry.
+    # Expired keys are deleted every IDEMPOTENCY_PURGE_SECONDS,
+    # IDEMPOTENCY_PURGE_BATCH_SIZE rows per DELETE. Only JSON bodies of up
+    # to IDEMPOTENCY_MAX_BODY_BYTES are accepted with a key
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24
+    IDEMPOTENCY_LOCK_SECONDS: float = 60
+    IDEMPOTENCY_PURGE_SECONDS: float = 60 * 10
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = 1000
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1024 * 1024
+
+    # Serialize list endpoints straight to JSON bytes, skipping FastAPI's
+    # response_model pass (the schema and output stay the same)
+    FAST_JSON_RESPONSES: bool = False
+
+    # JSON and text responses of at least COMPRESSION_MIN_BYTES are
+    # compressed for clients that accept it: brotli at BROTLI_QUALITY when
+    # the brotli package is installed, else gzip at GZIP_LEVEL
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 500
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
+    # Largest list accepted by the batch creation endpoints
+    BATCH_MAX_ITEMS: int = 500
+
+    # Serialized /feed pages, dropped on any write that shows up in the feed.
+    # The in-memory cache and its invalidation are per process: under
+    # several workers, pages cached by the others stay up to
+    # FEED_CACHE_TTL_SECONDS stale after a write, unless feed_cache is given
+    # a backend shared between them (app.core.cache.CacheBackend)
+    FEED_CACHE_TTL_SECONDS: int = 30
+    FEED_CACHE_MAX_SIZE: int = 1024
+
+    # Event streams: events kept for clients resuming with Last-Event-ID,
+    # events a subscriber may fall behind before it is dropped, and seconds
+    # between keepalive comments on an idle stream. Streams only carry the
+    # writes of their own process (see workers in gunicorn.conf.py)
+    EVENTS_HISTORY_SIZE: int = 1000
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_KEEPALIVE_SECONDS: float = 15
+
+    # bcrypt work factor, each +1 doubles hashing time
+    BCRYPT_ROUNDS: int = 12
+    # Password hashing runs on its own thread pool; requests beyond
+    # PWD_HASH_MAX_PENDING (queued + running) are refused with a 503
+    PWD_HASH_WORKERS: int = 4
+    PWD_HASH_MAX_PENDING: int = 64
+
+    # Requests slower than this are logged with their DB statement count/time
+    SLOW_REQUEST_SECONDS: float = 1.0
+    # Fraction of requests run under cProfile; profiles of the ones slower
+    # than SLOW_REQUEST_SECONDS are dumped to PROFILE_PATH
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_PATH: Path = Path().absolute().joinpath("profiles")
+    # /metrics is readable by superusers, and by scrapers sending this as a
+    # bearer token when set
+    METRICS_TOKEN: str | None = None
 
     SERVER_NAME: str
     SERVER_HOST: AnyHttpUrl
@@ -48,6 +180,30 @@ class Settings(BaseSettings):
 
     SQLALCHEMY_DATABASE_URI: Annotated[str, AfterValidator(db_uri_validator)] = ""
 
+    # Connection pool, ignored by pools that don't queue (e.g. SQLite's)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a free connection before failing the request
+    DB_POOL_TIMEOUT: float = 30
+    # Test connections on checkout, costs a round trip per checkout
+    DB_POOL_PRE_PING: bool = False
+    # Replace connections older than this many seconds, -1 to never recycle
+    DB_POOL_RECYCLE: int = 1800
+
+    # Optional read replica for GET routes (ReadSessionDep). Clients read
+    # from the primary for READ_YOUR_WRITES_SECONDS after writing, told by a
+    # cookie (or X-Read-Primary header) signed with SECRET_KEY, which every
+    # worker must then share. All reads go to the primary for
+    # REPLICA_RETRY_SECONDS after the replica fails to connect within
+    # REPLICA_CONNECT_TIMEOUT_SECONDS
+    SQLALCHEMY_READ_REPLICA_URI: str | None = None
+    READ_YOUR_WRITES_SECONDS: float = 5
+    REPLICA_CONNECT_TIMEOUT_SECONDS: float = 1
+    REPLICA_RETRY_SECONDS: float = 30
+
+    # /health/ready fails if the database takes longer than this to answer
+    HEALTH_DB_TIMEOUT_SECONDS: float = 2
+
     SUPERUSER_EMAIL: str
     SUPERUSER_PHONE: str
     SUPERUSER_PASSWORD: str
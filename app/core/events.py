@@ -0,0 +1,137 @@
+import asyncio
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+
+__all__ = ["Event", "Subscription", "EventBroker", "broker"]
+
+SSE_SUBSCRIBERS = Gauge("sse_subscribers", "Open event stream subscriptions")
+SSE_EVICTIONS = Counter(
+    "sse_evictions_total", "Subscribers dropped for not keeping up with events"
+)
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    type: str
+    search_id: int | None
+    data: str
+
+    def encode(self) -> bytes:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n".encode()
+
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class Subscription:
+    """
+    One client's view of the broker. Missed events being replayed come
+    first, then live ones from a bounded queue. A subscriber whose queue
+    fills up is evicted: its stream ends after what was already queued,
+    and the client reconnects with Last-Event-ID to catch up.
+    """
+
+    def __init__(self, broker: "EventBroker", search_id: int | None, maxsize: int):
+        self.broker = broker
+        self.search_id = search_id
+        self.backlog: deque[Event] = deque()
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize)
+        self.evicted = False
+
+    def wants(self, event: Event) -> bool:
+        return self.search_id is None or event.search_id in (None, self.search_id)
+
+    def offer(self, event: Event) -> bool:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.evicted = True
+            return False
+        return True
+
+    async def stream(self, keepalive: float) -> AsyncIterator[bytes]:
+        """SSE frames, with a comment every `keepalive` seconds of silence."""
+        try:
+            while self.backlog:
+                yield self.backlog.popleft().encode()
+            while not (self.evicted and self.queue.empty()):
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+                    continue
+                yield event.encode()
+        finally:
+            self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """
+    In-process fan-out of new searches and sightings to event stream
+    subscribers. The last `history` events are kept for resuming. Ids are
+    only meaningful to the process that issued them, so with several
+    workers a reconnect landing elsewhere gets a "reset" event instead.
+    """
+
+    def __init__(self, history: int, queue_size: int):
+        self.queue_size = queue_size
+        self.epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._history: deque[tuple[int, Event]] = deque(maxlen=history)
+        self._subscribers: set[Subscription] = set()
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, type: str, search_id: int | None, data: str) -> Event:
+        self._seq += 1
+        event = Event(self._event_id(self._seq), type, search_id, data)
+        self._history.append((self._seq, event))
+
+        for subscription in list(self._subscribers):
+            if subscription.wants(event) and not subscription.offer(event):
+                SSE_EVICTIONS.inc()
+                self.unsubscribe(subscription)
+        return event
+
+    def _missed(self, last_event_id: str) -> list[Event] | None:
+        """Events after `last_event_id`, None if they're no longer known."""
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        last_seq = int(seq)
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if last_seq < oldest - 1:
+            return None
+        return [event for s, event in self._history if s > last_seq]
+
+    def subscribe(
+        self, search_id: int | None = None, last_event_id: str | None = None
+    ) -> Subscription:
+        subscription = Subscription(self, search_id, self.queue_size)
+        if last_event_id:
+            missed = self._missed(last_event_id)
+            if missed is None:
+                # Too far behind to replay, the client should reload
+                subscription.backlog.append(
+                    Event(self._event_id(self._seq), "reset", None, "{}")
+                )
+            else:
+                subscription.backlog.extend(e for e in missed if subscription.wants(e))
+
+        self._subscribers.add(subscription)
+        SSE_SUBSCRIBERS.set(len(self._subscribers))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        SSE_SUBSCRIBERS.set(len(self._subscribers))
+
+
+broker = EventBroker(settings.EVENTS_HISTORY_SIZE, settings.EVENTS_QUEUE_SIZE)
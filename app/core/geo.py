@@ -0,0 +1,209 @@
+import math
+from dataclasses import dataclass
+from typing import Generic, Hashable, TypeVar
+
+__all__ = [
+    "encode",
+    "decode_bbox",
+    "covering_prefixes",
+    "covering_cells",
+    "haversine_km",
+    "Circle",
+    "CircleGrid",
+]
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Stored precision, cells are about 4.8m x 4.8m
+PRECISION = 9
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # Bits alternate starting with longitude
+
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            rng[0] = mid
+        else:
+            bits = bits * 2
+            rng[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> tuple[float, float, float, float]:
+    """Returns (min_lat, min_lon, max_lat, max_lon) of the cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if bits >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def _cell_size(precision: int) -> tuple[float, float]:
+    """Cell (height, width) in degrees for a geohash precision."""
+    bits = precision * 5
+    lat_bits, lon_bits = bits // 2, bits - bits // 2
+    return 180 / 2**lat_bits, 360 / 2**lon_bits
+
+
+def covering_prefixes(lat: float, lon: float, radius_km: float) -> list[str]:
+    """
+    Geohash prefixes whose cells together cover the circle of `radius_km`
+    around (lat, lon): the cell containing the point plus its 8 neighbours,
+    at the finest precision whose cells are still at least radius wide.
+    Points with one of these prefixes are candidates, not guaranteed hits.
+    """
+    radius_lat = radius_km / KM_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    radius_lon = radius_km / (KM_PER_DEGREE * cos_lat)
+
+    precision = 1
+    while precision < PRECISION:
+        height, width = _cell_size(precision + 1)
+        if height < radius_lat or width < radius_lon:
+            break
+        precision += 1
+
+    height, width = _cell_size(precision)
+    if height < radius_lat or width < radius_lon:
+        # Radius wider than the coarsest cells, no prefix can narrow it
+        return [""]
+
+    min_lat, min_lon, max_lat, max_lon = decode_bbox(encode(lat, lon, precision))
+    center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+    prefixes = []
+    for d_lat in (-height, 0, height):
+        cell_lat = center_lat + d_lat
+        if not -90 < cell_lat < 90:
+            continue
+        for d_lon in (-width, 0, width):
+            cell_lon = (center_lon + d_lon + 180) % 360 - 180
+            prefix = encode(cell_lat, cell_lon, precision)
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def covering_cells(
+    lat: float, lon: float, radius_km: float, precision: int
+) -> list[str]:
+    """
+    Geohashes of all cells at `precision` overlapping the bounding box of
+    the circle of `radius_km` around (lat, lon).
+    """
+    height, width = _cell_size(precision)
+    radius_lat = radius_km / KM_PER_DEGREE
+    # Widest at the latitude farthest from the equator
+    far_lat = min(abs(lat) + radius_lat, 90)
+    cos_lat = max(math.cos(math.radians(far_lat)), 1e-6)
+    radius_lon = radius_km / (KM_PER_DEGREE * cos_lat)
+
+    south = math.floor((max(lat - radius_lat, -90) + 90) / height)
+    north = math.floor((min(lat + radius_lat, 90) + 90) / height)
+    north = min(north, round(180 / height) - 1)
+    columns = round(360 / width)
+    west = math.floor((lon - radius_lon + 180) / width)
+    east = math.floor((lon + radius_lon + 180) / width)
+    if east - west + 1 >= columns:
+        west, east = 0, columns - 1
+
+    cells = []
+    for row in range(south, north + 1):
+        cell_lat = -90 + (row + 0.5) * height
+        for column in range(west, east + 1):
+            cell_lon = -180 + (column % columns + 0.5) * width
+            cells.append(encode(cell_lat, cell_lon, precision))
+    return cells
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(frozen=True, slots=True)
+class Circle(Generic[V]):
+    lat: float
+    lon: float
+    radius_km: float
+    value: V
+
+
+class CircleGrid(Generic[K, V]):
+    """
+    Circles indexed under every geohash cell at `precision` they overlap,
+    so the circles containing a point are found among those of its single
+    cell. Lookups cost the size of one cell's bucket, not of the index;
+    a circle costs memory for each cell it spans, so precision should give
+    cells not much smaller than the typical radius.
+    """
+
+    def __init__(self, precision: int):
+        self.precision = precision
+        self._cells: dict[str, dict[K, Circle[V]]] = {}
+        self._circles: dict[K, list[str]] = {}
+
+    def add(self, key: K, circle: Circle[V]):
+        self.remove(key)
+        cells = covering_cells(circle.lat, circle.lon, circle.radius_km, self.precision)
+        for cell in cells:
+            self._cells.setdefault(cell, {})[key] = circle
+        self._circles[key] = cells
+
+    def remove(self, key: K):
+        for cell in self._circles.pop(key, ()):
+            bucket = self._cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self._cells[cell]
+
+    def containing(self, lat: float, lon: float) -> list[Circle[V]]:
+        bucket = self._cells.get(encode(lat, lon, self.precision), {})
+        return [
+            circle
+            for circle in bucket.values()
+            if haversine_km(lat, lon, circle.lat, circle.lon) <= circle.radius_km
+        ]
+
+    def __len__(self):
+        return len(self._circles)
@@ -0,0 +1,58 @@
+import cProfile
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from app.core.config import settings
+
+__all__ = ["start_profile", "stop_profile", "finish_profile"]
+
+# cProfile hooks the whole thread, so at most one request is profiled at a
+# time. With the event loop's thread shared, a profile also contains
+# whatever other requests ran while it was being collected.
+_lock = threading.Lock()
+
+
+def start_profile() -> cProfile.Profile | None:
+    """Starts profiling a PROFILE_SAMPLE_RATE sample of the calls."""
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return None
+    if not _lock.acquire(blocking=False):
+        return None
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Another profiler is already active
+        _lock.release()
+        return None
+    return profiler
+
+
+def stop_profile(profiler: cProfile.Profile):
+    """Stops `profiler` without keeping what it collected."""
+    try:
+        profiler.disable()
+    finally:
+        _lock.release()
+
+
+def finish_profile(
+    profiler: cProfile.Profile, duration: float, label: str
+) -> Path | None:
+    """
+    Stops `profiler` and, for calls over SLOW_REQUEST_SECONDS, dumps its
+    stats (readable with pstats or snakeviz). Returns the dump's path.
+    """
+    stop_profile(profiler)
+    if duration < settings.SLOW_REQUEST_SECONDS:
+        return None
+
+    settings.PROFILE_PATH.mkdir(parents=True, exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")
+    path = settings.PROFILE_PATH / f"{time.time_ns()}-{name}.prof"
+    profiler.dump_stats(path)
+    return path
@@ -0,0 +1,110 @@
+import functools
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Protocol
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import Counter
+
+__all__ = [
+    "RateLimit",
+    "RateLimitBackend",
+    "MemoryRateLimitBackend",
+    "RateLimiter",
+    "rate_limiter",
+]
+
+RATE_LIMITED = Counter(
+    "rate_limited_total", "Requests refused by a rate limit", ("limit",)
+)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+LIMIT_RE = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A bucket of `burst` tokens refilling at `rate` tokens per second."""
+
+    rate: float
+    burst: float
+
+    @classmethod
+    @functools.cache
+    def parse(cls, spec: str) -> "RateLimit":
+        """ "<requests>/<second|minute|hour|day>", bursting up to <requests>."""
+        match = LIMIT_RE.match(spec)
+        if match is None:
+            raise ValueError(f"Invalid rate limit {spec!r}")
+        requests, period = int(match[1]), PERIODS[match[2]]
+        return cls(requests / period, requests)
+
+
+class RateLimitBackend(Protocol):
+    """
+    Bucket storage for RateLimiter. A shared store (e.g. a Redis script)
+    can implement it to apply limits across processes.
+    """
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1) -> float:
+        """
+        Takes `cost` tokens from the bucket at `key`. Returns 0 when they
+        were available, otherwise the seconds until they will be.
+        """
+        ...
+
+
+class MemoryRateLimitBackend:
+    def __init__(
+        self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic
+    ):
+        # Idle buckets refill completely, so dropping them loses nothing
+        self._buckets: TTLCache[str, tuple[float, float]] = TTLCache(maxsize, ttl)
+        self._timer = timer
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1) -> float:
+        with self._lock:
+            now = self._timer()
+            tokens, updated = self._buckets.get(key) or (limit.burst, now)
+            tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+            if tokens >= cost:
+                self._buckets.set(key, (tokens - cost, now))
+                return 0
+            self._buckets.set(key, (tokens, now))
+            return (cost - tokens) / limit.rate
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, limits: dict[str, str]):
+        self.backend = backend
+        self.limits = {name: RateLimit.parse(spec) for name, spec in limits.items()}
+
+    async def hit(self, name: str, key: str) -> float:
+        """
+        Counts a request against limit `name` for `key`. Returns 0 if it is
+        allowed, otherwise the seconds the client should wait.
+        """
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0
+        retry_after = await self.backend.take(f"{name}:{key}", limit)
+        if retry_after:
+            RATE_LIMITED.inc(limit=name)
+        return retry_after
+
+
+def _refill_seconds(limits: dict[str, str]) -> float:
+    parsed = [RateLimit.parse(spec) for spec in limits.values()]
+    return max((limit.burst / limit.rate for limit in parsed), default=1)
+
+
+rate_limiter = RateLimiter(
+    MemoryRateLimitBackend(
+        settings.RATE_LIMIT_MAX_KEYS, _refill_seconds(settings.RATE_LIMITS)
+    ),
+    settings.RATE_LIMITS,
+)
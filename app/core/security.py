@@ -1,35 +1,108 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Any, Callable, TypeVar
 
 from jose import jwt
 import bcrypt
 
 if __name__ == "__main__":
     from config import settings
+    from metrics import Counter, Gauge
 else:
     from app.core.config import settings
+    from app.core.metrics import Counter, Gauge
 
-__all__ = ["create_access_token", "verify_pwd", "get_pwd_hash"]
+__all__ = [
+    "create_access_token",
+    "verify_pwd",
+    "get_pwd_hash",
+    "verify_pwd_async",
+    "get_pwd_hash_async",
+    "HashPoolSaturated",
+]
 
 ALGORITHM = "HS256"
 
+T = TypeVar("T")
 
-def create_access_token(subject: int, expires_delta: timedelta | None = None):
-    expire = (
-        datetime.utcnow() + expires_delta
-        if expires_delta
-        else timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+def create_access_token(
+    subject: int,
+    expires_delta: timedelta | None = None,
+    claims: dict[str, Any] | None = None,
+):
+    now = datetime.utcnow()
+    expire = now + (
+        expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
-    to_encode = {"sub": str(subject), "exp": expire}
+    to_encode = {"sub": str(subject), "iat": now, "exp": expire, **(claims or {})}
 
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
 
 
 def get_pwd_hash(pwd: str):
     pwd_bytes = pwd.encode()
-    hashed_pwd = bcrypt.hashpw(pwd_bytes, bcrypt.gensalt())
+    hashed_pwd = bcrypt.hashpw(pwd_bytes, bcrypt.gensalt(settings.BCRYPT_ROUNDS))
     return hashed_pwd
 
 
 def verify_pwd(plain_pwd: str, hashed_pwd: bytes):
     return bcrypt.checkpw(plain_pwd.encode(), hashed_pwd)
+
+
+class HashPoolSaturated(Exception):
+    pass
+
+
+class HashPool:
+    """
+    Runs bcrypt off the event loop on a fixed number of threads (bcrypt
+    releases the GIL while hashing). At most `max_pending` calls may be
+    queued or running; past that callers get HashPoolSaturated right away
+    instead of piling up behind a login burst.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers, "pwd-hash")
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.pending - self.max_workers, 0)
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            PWD_HASH_REJECTED.inc()
+            raise HashPoolSaturated("Password hashing pool is saturated")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+
+hash_pool = HashPool(settings.PWD_HASH_WORKERS, settings.PWD_HASH_MAX_PENDING)
+
+PWD_HASH_QUEUE_DEPTH = Gauge(
+    "pwd_hash_queue_depth",
+    "Password hash/verify calls waiting for a worker thread",
+    function=lambda: hash_pool.queue_depth,
+)
+PWD_HASH_REJECTED = Counter(
+    "pwd_hash_rejected_total",
+    "Password hash/verify calls refused because the pool was saturated",
+)
+
+
+async def get_pwd_hash_async(pwd: str) -> bytes:
+    return await hash_pool.run(get_pwd_hash, pwd)
+
+
+async def verify_pwd_async(plain_pwd: str, hashed_pwd: bytes) -> bool:
+    return await hash_pool.run(verify_pwd, plain_pwd, hashed_pwd)
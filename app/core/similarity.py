@@ -0,0 +1,194 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.geo import EARTH_RADIUS_KM
+
+__all__ = ["ATTRIBUTES", "Vocabulary", "PetQuery", "Weights", "PetMatrix"]
+
+# Free-text pet attributes compared by the matcher, as on /feed/search
+ATTRIBUTES = ("breed", "fur_color", "size")
+
+UNKNOWN = -1  # Code of a missing value
+UNSEEN = -2  # Code of a queried value no pet has
+
+
+def normalize(value: str | None) -> str | None:
+    value = value.strip().lower() if value else None
+    return value or None
+
+
+class Vocabulary:
+    """Integer codes for the distinct normalized values of an attribute."""
+
+    def __init__(self):
+        self._codes: dict[str, int] = {}
+
+    def code(self, value: str | None) -> int:
+        value = normalize(value)
+        if value is None:
+            return UNKNOWN
+        return self._codes.setdefault(value, len(self._codes))
+
+    def lookup(self, value: str | None) -> int:
+        value = normalize(value)
+        if value is None:
+            return UNKNOWN
+        return self._codes.get(value, UNSEEN)
+
+
+@dataclass(frozen=True)
+class PetQuery:
+    kind: str
+    breed: str | None = None
+    fur_color: str | None = None
+    size: str | None = None
+    lat: float | None = None
+    lon: float | None = None
+
+
+@dataclass(frozen=True)
+class Weights:
+    """
+    Score of each matching attribute. An attribute unknown on either side
+    scores half its weight. Distance scores `distance` at 0km, decaying by
+    a factor of e every `distance_scale_km`.
+    """
+
+    breed: float = 3
+    fur_color: float = 2
+    size: float = 1
+    distance: float = 4
+    distance_scale_km: float = 10
+
+
+class PetMatrix:
+    """
+    Encoded attributes of the pets of active searches, one row per search,
+    in column arrays so a query scores its kind's rows in a few vectorized
+    operations. Rows are updated in place; removed rows are masked out and
+    their slots reused.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.vocabularies = {attribute: Vocabulary() for attribute in ATTRIBUTES}
+        self.kinds = Vocabulary()
+        self._slots: dict[int, int] = {}
+        self._free: list[int] = []
+        self._size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        def grow(name: str, dtype, fill):
+            column = np.full(capacity, fill, dtype=dtype)
+            if hasattr(self, name):
+                column[: self._size] = getattr(self, name)[: self._size]
+            setattr(self, name, column)
+
+        grow("ids", np.int64, 0)
+        grow("alive", np.bool_, False)
+        grow("kind", np.int32, UNKNOWN)
+        for attribute in ATTRIBUTES:
+            grow(attribute, np.int32, UNKNOWN)
+        # Radians, NaN when the search has no located sighting
+        grow("lat", np.float64, np.nan)
+        grow("lon", np.float64, np.nan)
+        grow("cos_lat", np.float64, np.nan)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def upsert(
+        self,
+        search_id: int,
+        kind: str,
+        attributes: dict[str, str | None],
+        lat: float | None,
+        lon: float | None,
+    ):
+        slot = self._slots.get(search_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._size == len(self.ids):
+                    self._allocate(2 * len(self.ids))
+                slot = self._size
+                self._size += 1
+            self._slots[search_id] = slot
+
+        self.ids[slot] = search_id
+        self.alive[slot] = True
+        self.kind[slot] = self.kinds.code(kind)
+        for attribute in ATTRIBUTES:
+            code = self.vocabularies[attribute].code(attributes.get(attribute))
+            getattr(self, attribute)[slot] = code
+        located = lat is not None and lon is not None
+        self.lat[slot] = math.radians(lat) if located else np.nan  # type: ignore
+        self.lon[slot] = math.radians(lon) if located else np.nan  # type: ignore
+        self.cos_lat[slot] = np.cos(self.lat[slot])
+
+    def location(self, search_id: int) -> tuple[float, float] | None:
+        slot = self._slots.get(search_id)
+        if slot is None or np.isnan(self.lat[slot]):
+            return None
+        return math.degrees(self.lat[slot]), math.degrees(self.lon[slot])
+
+    def remove(self, search_id: int):
+        slot = self._slots.pop(search_id, None)
+        if slot is not None:
+            self.alive[slot] = False
+            self._free.append(slot)
+
+    def scores(
+        self, query: PetQuery, weights: Weights
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Slots of the live rows of the queried kind, and their scores. Only
+        those rows are gathered and scored, so each kind costs its share of
+        the matrix.
+        """
+        n = self._size
+        kind = self.kinds.lookup(query.kind)
+        slots = np.flatnonzero(self.alive[:n] & (self.kind[:n] == kind))
+        scores = np.zeros(len(slots))
+
+        for attribute in ATTRIBUTES:
+            weight = getattr(weights, attribute)
+            code = self.vocabularies[attribute].lookup(getattr(query, attribute))
+            if code == UNKNOWN:
+                scores += weight / 2
+                continue
+            column = getattr(self, attribute)[slots]
+            scores[column == code] += weight
+            scores[column == UNKNOWN] += weight / 2
+
+        if query.lat is not None and query.lon is not None:
+            distances = self._distances_km(query.lat, query.lon, slots)
+            decay = np.exp(distances / -weights.distance_scale_km, out=distances)
+            scores += weights.distance * np.nan_to_num(decay, nan=0, copy=False)
+
+        return slots, scores
+
+    def _distances_km(self, lat: float, lon: float, slots: np.ndarray) -> np.ndarray:
+        # Haversine, as geo.haversine_km
+        phi, lam = math.radians(lat), math.radians(lon)
+        a = np.sin((self.lat[slots] - phi) / 2) ** 2
+        b = np.sin((self.lon[slots] - lam) / 2) ** 2
+        b *= math.cos(phi) * self.cos_lat[slots]
+        a += b
+        np.clip(a, 0, 1, out=a)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a, out=a), out=a)
+
+    def top(self, query: PetQuery, weights: Weights, k: int) -> list[tuple[int, float]]:
+        """The `k` best scoring search ids with their scores, best first."""
+        slots, scores = self.scores(query, weights)
+        k = min(k, len(slots))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        ids = self.ids[slots[best]]
+        # Best first, equal scores newest first
+        order = np.lexsort((-ids, -scores[best]))
+        return [(int(ids[i]), float(scores[best][i])) for i in order]
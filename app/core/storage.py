@@ -0,0 +1,148 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator
+
+from anyio import to_thread
+
+from app.core.config import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are skipped without Pillow
+    Image = None
+
+__all__ = [
+    "IMAGE_TYPES",
+    "ImageTooLarge",
+    "UnsupportedImage",
+    "sniff_image_type",
+    "image_path",
+    "parse_image_id",
+    "store_image",
+    "make_thumbnails",
+]
+
+
+# Accepted upload content types and the extension they are stored under
+IMAGE_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+MEDIA_TYPES = {ext: media_type for media_type, ext in IMAGE_TYPES.items()}
+
+IMAGE_ID_RE = re.compile(r"^([0-9a-f]{64})\.(jpg|png|webp|gif)$")
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class UnsupportedImage(Exception):
+    pass
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Extension of the image format the first bytes of a file belong to."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def images_dir() -> Path:
+    return settings.STATIC_PATH / "images"
+
+
+def parse_image_id(image_id: str) -> tuple[str, str] | None:
+    """Splits an image id ("<sha256>.<ext>") into digest and extension."""
+    match = IMAGE_ID_RE.match(image_id)
+    return (match[1], match[2]) if match else None
+
+
+def image_path(digest: str, ext: str, width: int | None = None) -> Path:
+    # Fan out over 256 directories to keep listings short
+    name = f"{digest}_w{width}.{ext}" if width else f"{digest}.{ext}"
+    return images_dir() / digest[:2] / name
+
+
+async def store_image(chunks: AsyncIterator[bytes]) -> str:
+    """
+    Writes the streamed upload to a temporary file while hashing it, then
+    moves it to its content address. Returns the image id; uploading the
+    same bytes twice keeps a single file. The format is told by the file's
+    first bytes, whatever type the client declared, and anything but one
+    of IMAGE_TYPES raises UnsupportedImage.
+    """
+    tmp_dir = settings.STATIC_PATH / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    size = 0
+    ext = None
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            async for chunk in chunks:
+                if ext is None:
+                    ext = sniff_image_type(chunk)
+                    if ext is None:
+                        raise UnsupportedImage()
+                size += len(chunk)
+                if size > settings.IMAGE_MAX_BYTES:
+                    raise ImageTooLarge()
+                hasher.update(chunk)
+                await to_thread.run_sync(tmp.write, chunk)
+        if ext is None:
+            raise UnsupportedImage()
+
+        digest = hasher.hexdigest()
+        path = image_path(digest, ext)
+        if path.exists():
+            os.unlink(tmp_name)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+    return f"{digest}.{ext}"
+
+
+def make_thumbnails(image_id: str):
+    """
+    Writes a downscaled copy of the image for each configured width. Blocking,
+    run by the "make_thumbnails" job, which retries it if it raises.
+    """
+    parsed = parse_image_id(image_id)
+    if Image is None or parsed is None:
+        return
+    digest, ext = parsed
+
+    with Image.open(image_path(digest, ext)) as original:
+        for width in settings.IMAGE_THUMBNAIL_WIDTHS:
+            target = image_path(digest, ext, width)
+            if target.exists():
+                continue
+            thumbnail = original.copy()
+            thumbnail.thumbnail((width, width * 4))
+            fd, tmp_name = tempfile.mkstemp(dir=target.parent, suffix=f".{ext}")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    thumbnail.save(tmp, format=original.format)
+                os.replace(tmp_name, target)
+            except BaseException:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+                raise
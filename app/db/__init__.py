@@ -1,19 +1,19 @@
 from logging import Logger
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
-from app.models import SQLModel, User, UserCreate
+from app.models import User, UserCreate
 from app.db import crud
-from app.db.engine import engine
+from app.db.migrations import migrate
 
 
-def init_db(session: Session, logger: Logger):
-    # Create tables
-    SQLModel.metadata.create_all(bind=engine)
-    logger.info("Table created")
+async def init_db(session: AsyncSession, logger: Logger):
+    await migrate(logger)
+    logger.info("Database migrated")
 
-    user = session.exec(
-        select(User).where(User.email == settings.SUPERUSER_EMAIL)
+    user = (
+        await session.exec(select(User).where(User.email == settings.SUPERUSER_EMAIL))
     ).first()
 
     if not user:
@@ -24,5 +24,5 @@ def init_db(session: Session, logger: Logger):
             is_superuser=True,
         )
 
-        user = crud.create_user(session, superuser_in)
+        user = await crud.create_user(session, superuser_in)
         logger.info("Superuser created")
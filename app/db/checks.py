@@ -0,0 +1,47 @@
+import sys
+
+from sqlalchemy import MetaData, Table
+
+from app.models import SQLModel
+
+__all__ = ["unindexed_foreign_keys"]
+
+
+def _leading_columns(table: Table) -> list[list[str]]:
+    """Column name lists that can serve lookups by their leftmost columns."""
+    leading = [[c.name for c in table.primary_key.columns]]
+    for index in table.indexes:
+        # Expression parts end the usable prefix
+        names = []
+        for expression in index.expressions:
+            name = getattr(expression, "name", None)
+            if name is None or name not in table.c:
+                break
+            names.append(name)
+        leading.append(names)
+    return leading
+
+
+def unindexed_foreign_keys(metadata: MetaData = SQLModel.metadata) -> list[str]:
+    """
+    Foreign keys whose columns aren't the leading columns of any index or
+    the primary key, as "table(col, ...)". Joins and cascading deletes
+    through them scan the whole table.
+    """
+    missing = []
+    for table in metadata.sorted_tables:
+        leading = _leading_columns(table)
+        for fk in table.foreign_key_constraints:
+            columns = [c.name for c in fk.columns]
+            if not any(
+                sorted(names[: len(columns)]) == sorted(columns) for names in leading
+            ):
+                missing.append(f"{table.name}({', '.join(columns)})")
+    return missing
+
+
+if __name__ == "__main__":
+    if missing := unindexed_foreign_keys():
+        print("Foreign keys without an index:", *missing, sep="\n  ")
+        sys.exit(1)
+    print("Every foreign key is indexed")
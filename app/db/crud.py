@@ -1,57 +1,140 @@
+from datetime import datetime
 from typing import Union
-from sqlmodel import Session, select
+from sqlalchemy import (
+    ColumnElement,
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    literal_column,
+    or_,
+    update,
+)
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from sqlmodel import col, select
+from sqlmodel.sql.expression import SelectOfScalar
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models import (
+    FTS_CONFIG,
     NewPet,
     NewSearch,
     NewSighting,
+    NewSubscription,
+    Notification,
+    NotificationEvent,
     Pet,
     Search,
+    SearchFilter,
+    SearchReadFeed,
     SearchUpdate,
+    Sighting,
+    SightingEvent,
+    Subscription,
     User,
     UserCreate,
     UserUpdate,
 )
-from app.core import security
+from app.core import geo, security
+from app.core.cache import feed_cache, user_cache
+from app.core.events import broker
+from app.db import jobs
+
+# Loader options matching each nested response model, so serializing a page
+# costs a fixed number of queries instead of one lazy load per relationship.
+# Many-to-one sides are joined into the main query, collections are loaded
+# with one extra SELECT ... WHERE fk IN (...) per level.
+SEARCH_READ_W_ALL_OPTIONS = (
+    joinedload(Search.user),  # type: ignore
+    joinedload(Search.pet),  # type: ignore
+    selectinload(Search.sightings),  # type: ignore
+)
+# Feed items carry the sighting summary instead of the sightings
+SEARCH_READ_FEED_OPTIONS = (
+    joinedload(Search.user),  # type: ignore
+    joinedload(Search.pet),  # type: ignore
+)
+PET_READ_W_SEARCH_OPTIONS = (selectinload(Pet.searches),)  # type: ignore
+# Search.user is left to the identity map: it is the user being loaded.
+USER_READ_W_SEARCH_PET_OPTIONS = (
+    selectinload(User.pets),  # type: ignore
+    selectinload(User.searches).options(  # type: ignore
+        joinedload(Search.pet), selectinload(Search.sightings)  # type: ignore
+    ),
+)
 
 
-def get_user_by_email(session: Session, email: str) -> Union[User, None]:
+async def get_user_w_search_pet(
+    session: AsyncSession, user_id: int
+) -> Union[User, None]:
+    statement = (
+        select(User)
+        .where(User.id == user_id)
+        .options(*USER_READ_W_SEARCH_PET_OPTIONS)
+        .execution_options(populate_existing=True)
+    )
+    return (await session.exec(statement)).first()
+
+
+async def get_pets_by_user_id(session: AsyncSession, user_id: int) -> list[Pet]:
+    statement = (
+        select(Pet).where(Pet.user_id == user_id).options(*PET_READ_W_SEARCH_OPTIONS)
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def get_search_w_all(
+    session: AsyncSession, search_id: int
+) -> Union[Search, None]:
+    statement = (
+        select(Search)
+        .where(Search.id == search_id)
+        .options(*SEARCH_READ_W_ALL_OPTIONS)
+        .execution_options(populate_existing=True)
+    )
+    return (await session.exec(statement)).first()
+
+
+async def get_user_by_email(session: AsyncSession, email: str) -> Union[User, None]:
     statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
+    session_user = (await session.exec(statement)).first()
     return session_user
 
 
-def authenticate(session: Session, email: str, password: str) -> Union[User, None]:
-    user = get_user_by_email(session, email)
+async def authenticate(
+    session: AsyncSession, email: str, password: str
+) -> Union[User, None]:
+    user = await get_user_by_email(session, email)
     if not user:
         return None
-    if security.verify_pwd(password, user.hashed_password):
+    if await security.verify_pwd_async(password, user.hashed_password):
         return user
     return None
 
 
-def create_user(session: Session, to_create: UserCreate) -> User:
+async def create_user(session: AsyncSession, to_create: UserCreate) -> User:
     db_obj = User.model_validate(
         to_create,
         update={
-            "hashed_password": security.get_pwd_hash(to_create.password),
+            "hashed_password": await security.get_pwd_hash_async(to_create.password),
             "phone": str(to_create.phone),
             "image": str(to_create.image),
         },
     )
 
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
 
     return db_obj
 
 
-def update_user(session: Session, db_obj: User, obj_in: UserUpdate):
+async def update_user(session: AsyncSession, db_obj: User, obj_in: UserUpdate):
     update_data = obj_in.model_dump(exclude_unset=True)
 
     if plain_password := update_data.get("password"):
-        hashed_password = security.get_pwd_hash(plain_password)
+        hashed_password = await security.get_pwd_hash_async(plain_password)
         del update_data["password"]
         update_data["hashed_password"] = hashed_password
 
@@ -59,59 +142,418 @@ def update_user(session: Session, db_obj: User, obj_in: UserUpdate):
         setattr(db_obj, k, update_data.get(k, v))
 
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
+    user_cache.invalidate(db_obj.id)  # type: ignore
+    await feed_cache.invalidate()
+
+    return db_obj
+
+
+async def deactivate_user(session: AsyncSession, db_obj: User):
+    db_obj.is_active = False
+
+    session.add(db_obj)
+    await session.commit()
+    user_cache.invalidate(db_obj.id)  # type: ignore
+    await feed_cache.invalidate()
 
     return db_obj
 
 
-def create_pet(session: Session, to_create: NewPet, user_id: int):
+async def create_pet(session: AsyncSession, to_create: NewPet, user_id: int):
     db_obj = Pet.model_validate(
         to_create, update={"user_id": user_id, "image": str(to_create.image)}
     )
 
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
 
     return db_obj
 
 
-def create_sighting(session: Session, to_create: NewSighting, search_id: int):
-    db_obj = Search.model_validate(to_create, update={"search_id": search_id})
+async def delete_pet(session: AsyncSession, db_obj: Pet):
+    # A pet's searches, their sightings and notifications go with it
+    search_ids = select(Search.id).where(Search.pet_id == db_obj.id)
+    notifications = delete(Notification).where(
+        col(Notification.search_id).in_(search_ids)
+    )
+    await session.exec(notifications)  # type: ignore
+    sightings = delete(Sighting).where(col(Sighting.search_id).in_(search_ids))
+    await session.exec(sightings)  # type: ignore
+    await session.exec(delete(Search).where(col(Search.pet_id) == db_obj.id))  # type: ignore
+    await session.delete(db_obj)
+    await session.commit()
+    await feed_cache.invalidate()
+
+
+async def create_pets(
+    session: AsyncSession, to_create: list[NewPet], user_id: int
+) -> list[Pet]:
+    if not to_create:
+        return []
+    values = [
+        {**pet.model_dump(), "user_id": user_id, "image": str(pet.image)}
+        for pet in to_create
+    ]
+    # One multi-row INSERT ... RETURNING in a single transaction
+    pets = (await session.scalars(insert(Pet).returning(Pet), values)).all()
+    await session.commit()
+
+    return list(pets)
+
+
+async def get_subscriptions_by_user_id(
+    session: AsyncSession, user_id: int
+) -> list[Subscription]:
+    statement = select(Subscription).where(
+        Subscription.user_id == user_id, col(Subscription.is_active)
+    )
+    return list((await session.exec(statement.order_by(Subscription.id))).all())
 
+
+async def create_subscription(
+    session: AsyncSession, to_create: NewSubscription, user_id: int
+) -> Subscription:
+    db_obj = Subscription.model_validate(to_create, update={"user_id": user_id})
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    return db_obj
+
+
+async def delete_subscription(session: AsyncSession, db_obj: Subscription):
+    db_obj.is_active = False
+    db_obj.updated_at = datetime.utcnow()
+    session.add(db_obj)
+    await session.commit()
+
+
+def _sighting_values(to_create: NewSighting, search_id: int) -> dict:
+    geohash = (
+        geo.encode(to_create.lat, to_create.lon)
+        if to_create.lat is not None and to_create.lon is not None
+        else None
+    )
+    return {**to_create.model_dump(), "search_id": search_id, "geohash": geohash}
+
+
+def _summarize_sightings(search_id: int, values: list[dict]):
+    """
+    UPDATE adding new sightings to their search's summary. Done in SQL so
+    concurrent reports can't lose a count; the latest one by datetime wins.
+    """
+    latest = max(values, key=lambda v: v["datetime"])
+    newer = or_(
+        col(Search.last_sighting_at).is_(None),
+        col(Search.last_sighting_at) <= latest["datetime"],
+    )
+    return (
+        update(Search)
+        .where(col(Search.id) == search_id)
+        .values(
+            sighting_count=Search.sighting_count + len(values),
+            updated_at=datetime.utcnow(),
+            last_sighting_at=case(
+                (newer, latest["datetime"]), else_=Search.last_sighting_at
+            ),
+            last_sighting_loc=case(
+                (newer, latest["loc"]), else_=Search.last_sighting_loc
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _notify_sightings(
+    session: AsyncSession,
+    search_id: int,
+    sightings: list[Sighting],
+    event: NotificationEvent = NotificationEvent.SIGHTING,
+):
+    # Matched against subscriptions after the commit, on the job workers
+    jobs.enqueue(
+        session,
+        "notify_sightings",
+        {
+            "search_id": search_id,
+            "sighting_ids": [s.id for s in sightings],
+            "event": event,
+        },
+    )
+
+
+def _publish_search(search: Search):
+    data = SearchReadFeed.model_validate(search).model_dump_json()
+    broker.publish("search", search.id, data)
+
+
+def _publish_sightings(sightings: list[Sighting]):
+    for sighting in sightings:
+        data = SightingEvent.model_validate(sighting).model_dump_json()
+        broker.publish("sighting", sighting.search_id, data)
+
+
+async def create_sighting(
+    session: AsyncSession, to_create: NewSighting, search_id: int
+):
+    values = _sighting_values(to_create, search_id)
+    db_obj = Sighting.model_validate(values)
+
+    session.add(db_obj)
+    await session.execute(_summarize_sightings(search_id, [values]))
+    await session.flush()
+    _notify_sightings(session, search_id, [db_obj])
+    await session.commit()
+    await session.refresh(db_obj)
+    await feed_cache.invalidate()
+    _publish_sightings([db_obj])
 
     return db_obj
 
 
-def create_search(session: Session, to_create: NewSearch, user_id: int, pet_id: int):
+async def create_sightings(
+    session: AsyncSession, to_create: list[NewSighting], search_id: int
+) -> list[Sighting]:
+    if not to_create:
+        return []
+    values = [_sighting_values(sighting, search_id) for sighting in to_create]
+    sightings = (
+        await session.scalars(insert(Sighting).returning(Sighting), values)
+    ).all()
+    await session.execute(_summarize_sightings(search_id, values))
+    _notify_sightings(session, search_id, list(sightings))
+    await session.commit()
+    await feed_cache.invalidate()
+    _publish_sightings(list(sightings))
+
+    return list(sightings)
+
+
+async def create_search(
+    session: AsyncSession, to_create: NewSearch, user_id: int, pet_id: int
+):
     db_obj = Search.model_validate(
         to_create, update={"user_id": user_id, "pet_id": pet_id}
     )
 
-    session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    if to_create.sighting:
+        db_obj.sighting_count = 1
+        db_obj.last_sighting_at = to_create.sighting.datetime
+        db_obj.last_sighting_loc = to_create.sighting.loc
 
-    create_sighting(session, to_create.sighting, db_obj.id)  # type: ignore
-    session.refresh(db_obj)
-    return db_obj
+    session.add(db_obj)
+    if to_create.sighting:
+        await session.flush()
+        sighting = Sighting.model_validate(
+            _sighting_values(to_create.sighting, db_obj.id)  # type: ignore
+        )
+        session.add(sighting)
+        await session.flush()
+        _notify_sightings(
+            session, db_obj.id, [sighting], NotificationEvent.SEARCH  # type: ignore
+        )
+    await session.commit()
+    await feed_cache.invalidate()
+
+    search = await get_search_w_all(session, db_obj.id)  # type: ignore
+    _publish_search(search)  # type: ignore
+    return search
+
+
+async def create_searches(
+    session: AsyncSession, to_create: list[NewSearch], user_id: int, pet_id: int
+) -> list[Search]:
+    if not to_create:
+        return []
+    values = []
+    for new_search in to_create:
+        db_obj = Search.model_validate(
+            new_search, update={"user_id": user_id, "pet_id": pet_id}
+        )
+        if new_search.sighting:
+            db_obj.sighting_count = 1
+            db_obj.last_sighting_at = new_search.sighting.datetime
+            db_obj.last_sighting_loc = new_search.sighting.loc
+        values.append(db_obj.model_dump(exclude={"id"}))
+    # One multi-row INSERT ... RETURNING per table in a single transaction,
+    # rows returned in the order of `values` to pair searches with sightings
+    searches = (
+        await session.scalars(
+            insert(Search).returning(Search, sort_by_parameter_order=True), values
+        )
+    ).all()
+
+    first_sightings = [
+        (search.id, _sighting_values(new_search.sighting, search.id))  # type: ignore
+        for search, new_search in zip(searches, to_create)
+        if new_search.sighting
+    ]
+    if first_sightings:
+        sightings = (
+            await session.scalars(
+                insert(Sighting).returning(Sighting, sort_by_parameter_order=True),
+                [sighting for _, sighting in first_sightings],
+            )
+        ).all()
+        for (search_id, _), sighting in zip(first_sightings, sightings):
+            _notify_sightings(
+                session, search_id, [sighting], NotificationEvent.SEARCH  # type: ignore
+            )
+    await session.commit()
+    await feed_cache.invalidate()
+
+    statement = (
+        select(Search)
+        .where(col(Search.id).in_([search.id for search in searches]))
+        .options(*SEARCH_READ_W_ALL_OPTIONS)
+        .order_by(col(Search.id))
+        .execution_options(populate_existing=True)
+    )
+    created = list((await session.exec(statement)).all())
+    for search in created:
+        _publish_search(search)
+    return created
 
 
-def update_search(session: Session, db_obj: Search, obj_in: SearchUpdate):
+async def update_search(session: AsyncSession, db_obj: Search, obj_in: SearchUpdate):
     update_data = obj_in.model_dump(exclude_unset=True)
 
     for k, v in db_obj:
         setattr(db_obj, k, update_data.get(k, v))
-
-    if obj_in.sighting:
-        create_sighting(session, obj_in.sighting, db_obj.id)  # type: ignore
+    db_obj.updated_at = datetime.utcnow()
 
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    new_sightings = []
+    if obj_in.sighting:
+        sighting = _sighting_values(obj_in.sighting, db_obj.id)  # type: ignore
+        new_sightings.append(Sighting.model_validate(sighting))
+        session.add(new_sightings[0])
+        await session.flush()
+        await session.execute(_summarize_sightings(db_obj.id, [sighting]))  # type: ignore
+        _notify_sightings(session, db_obj.id, new_sightings)  # type: ignore
+    await session.commit()
+    await feed_cache.invalidate()
+    _publish_sightings(new_sightings)
+
+    return await get_search_w_all(session, db_obj.id)  # type: ignore
+
+
+async def get_nearby_searches(
+    session: AsyncSession,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    skip: int = 0,
+    limit: int = 10,
+) -> list[tuple[Search, float]]:
+    """
+    Active searches whose latest located sighting lies within `radius_km`
+    of (lat, lon), nearest first, with their distance.
+    """
+    # Candidates: searches with any sighting in the cells around the point,
+    # found through range scans on the geohash index
+    in_cells = or_(
+        *(
+            and_(col(Sighting.geohash) >= prefix, col(Sighting.geohash) < prefix + "~")
+            for prefix in geo.covering_prefixes(lat, lon, radius_km)
+        )
+    )
+    candidates = (
+        select(Sighting.search_id)
+        .join(Search)
+        .where(col(Search.is_active), in_cells)
+        .distinct()
+    )
 
-    return db_obj
+    # Latest located sighting of each candidate
+    latest = (
+        select(
+            Sighting.search_id,
+            Sighting.lat,
+            Sighting.lon,
+            func.row_number()
+            .over(
+                partition_by=Sighting.search_id,
+                order_by=(col(Sighting.datetime).desc(), col(Sighting.id).desc()),
+            )
+            .label("rank"),
+        )
+        .where(
+            col(Sighting.search_id).in_(candidates),
+            col(Sighting.geohash).is_not(None),
+        )
+        .subquery()
+    )
+    rows = (
+        await session.execute(
+            select(latest.c.search_id, latest.c.lat, latest.c.lon).where(
+                latest.c.rank == 1
+            )
+        )
+    ).all()
+
+    distances = {}
+    for search_id, s_lat, s_lon in rows:
+        distance = geo.haversine_km(lat, lon, s_lat, s_lon)
+        if distance <= radius_km:
+            distances[search_id] = distance
+    page = sorted(distances, key=distances.__getitem__)[skip : skip + limit]
+    if not page:
+        return []
+
+    statement = (
+        select(Search)
+        .where(col(Search.id).in_(page))
+        .options(*SEARCH_READ_FEED_OPTIONS)
+    )
+    searches = {s.id: s for s in (await session.exec(statement)).all()}
+    return [(searches[i], distances[i]) for i in page]
+
+
+def _full_text_match(dialect_name: str, column, q: str) -> ColumnElement[bool]:
+    if dialect_name == "postgresql":
+        # Same expression as the GIN indexes so the planner can use them
+        config = literal_column(f"'{FTS_CONFIG}'")
+        return func.to_tsvector(config, column).bool_op("@@")(
+            func.plainto_tsquery(config, q)
+        )
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return col(column).ilike(f"%{escaped}%", escape="\\")
+
+
+def build_search_query(
+    dialect_name: str, search_filter: SearchFilter
+) -> SelectOfScalar[Search]:
+    """
+    Searches joined with their pet and narrowed by every filter that is
+    set, loading what SearchReadFeed needs.
+    """
+    conditions: list[ColumnElement[bool]] = []
+
+    if search_filter.kind is not None:
+        conditions.append(col(Pet.kind) == search_filter.kind)
+    for attr in ("breed", "fur_color", "size"):
+        value = getattr(search_filter, attr)
+        if value is not None:
+            conditions.append(func.lower(getattr(Pet, attr)) == value.strip().lower())
+    if search_filter.is_active is not None:
+        conditions.append(col(Search.is_active) == search_filter.is_active)
+    if search_filter.q:
+        for word in search_filter.q.split():
+            conditions.append(
+                or_(
+                    _full_text_match(dialect_name, Search.poster, word),
+                    _full_text_match(dialect_name, Pet.name, word),
+                )
+            )
+
+    return (
+        select(Search)
+        .join(Pet, col(Search.pet_id) == Pet.id)
+        .where(*conditions)
+        .options(
+            contains_eager(Search.pet),  # type: ignore
+            joinedload(Search.user),  # type: ignore
+        )
+    )
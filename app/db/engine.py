@@ -1,6 +1,51 @@
-from sqlmodel import create_engine
-from pydantic_core import Url
+from sqlalchemy import QueuePool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from app.core.config import settings
+from app.db.instrumentation import (
+    instrument_pool,
+    instrument_queries,
+    timed_pool_class,
+)
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))  # type: ignore
+
+def make_engine(uri: str, name: str) -> AsyncEngine:
+    """
+    Creates an async engine with the pool configured from settings and
+    reporting to the db_pool_* metrics under `name`. Its statements are
+    counted and timed inside track_queries() blocks.
+    """
+    url = make_url(uri)
+    pool_class = url.get_dialect(_is_async=True).get_pool_class(url)
+
+    kwargs = {}
+    if issubclass(pool_class, QueuePool):
+        kwargs = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+
+    engine = create_async_engine(
+        url,
+        poolclass=timed_pool_class(pool_class, name),
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        **kwargs,
+    )
+    instrument_pool(engine, name)
+    instrument_queries(engine)
+    return engine
+
+
+# psycopg 3 serves both the sync and the async dialect, so the same
+# postgresql+psycopg URI works here (SQLite needs sqlite+aiosqlite).
+engine = make_engine(str(settings.SQLALCHEMY_DATABASE_URI), "primary")
+
+# Optional read-only copy of the primary, see app.db.replicas
+replica_engine = (
+    make_engine(settings.SQLALCHEMY_READ_REPLICA_URI, "replica")
+    if settings.SQLALCHEMY_READ_REPLICA_URI
+    else None
+)
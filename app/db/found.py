@@ -0,0 +1,135 @@
+import asyncio
+import datetime as dt
+import time
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import geo
+from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
+from app.core.similarity import PetMatrix, PetQuery, Weights
+from app.db.crud import SEARCH_READ_FEED_OPTIONS
+from app.models import Pet, Search, SearchReadFound, Sighting
+
+__all__ = ["FoundIndex", "found_index", "find_matches"]
+
+FOUND_INDEXED = Gauge("found_index_searches", "Active searches in the found index")
+FOUND_SCORE_DURATION = Histogram(
+    "found_score_seconds",
+    "Time scoring the found index for one query",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# Rows updated this long before the last sync are read again, for writes
+# that committed late or came from a host whose clock is behind
+SYNC_OVERLAP = dt.timedelta(seconds=60)
+
+
+def _latest_located(column):
+    """Correlated subquery: `column` of the search's latest located sighting."""
+    return (
+        select(column)
+        .where(Sighting.search_id == Search.id, col(Sighting.geohash).is_not(None))
+        .order_by(col(Sighting.datetime).desc(), col(Sighting.id).desc())
+        .limit(1)
+        .correlate(Search)
+        .scalar_subquery()
+    )
+
+
+class FoundIndex:
+    """
+    The pets of active searches in a PetMatrix, with the location of each
+    search's latest located sighting. The first sync loads every active
+    search, later ones only those changed since, through the updated_at
+    index. Searches deleted with their pet are noticed when a query's
+    results are loaded.
+    """
+
+    def __init__(self, interval: float):
+        self.matrix = PetMatrix()
+        self.interval = interval
+        self.synced_at: dt.datetime | None = None
+        self._checked = 0.0
+        self._lock = asyncio.Lock()
+
+    async def sync(self, session: AsyncSession):
+        async with self._lock:
+            if time.monotonic() - self._checked < self.interval:
+                return
+            started = dt.datetime.utcnow()
+            statement = select(
+                Search.id,
+                Search.is_active,
+                Pet.kind,
+                Pet.breed,
+                Pet.fur_color,
+                Pet.size,
+                _latest_located(Sighting.lat),
+                _latest_located(Sighting.lon),
+            ).join(Pet, col(Search.pet_id) == Pet.id)
+            if self.synced_at is None:
+                statement = statement.where(col(Search.is_active))
+            else:
+                since = self.synced_at - SYNC_OVERLAP
+                statement = statement.where(Search.updated_at >= since)
+
+            rows = (await session.execute(statement)).all()
+            for search_id, active, kind, breed, fur_color, size, lat, lon in rows:
+                if not active:
+                    self.matrix.remove(search_id)
+                    continue
+                attributes = {"breed": breed, "fur_color": fur_color, "size": size}
+                self.matrix.upsert(search_id, kind, attributes, lat, lon)
+
+            self.synced_at = started
+            self._checked = time.monotonic()
+            FOUND_INDEXED.set(len(self.matrix))
+
+
+found_index = FoundIndex(settings.FOUND_INDEX_SYNC_SECONDS)
+
+WEIGHTS = Weights(
+    **settings.FOUND_WEIGHTS, distance_scale_km=settings.FOUND_DISTANCE_SCALE_KM
+)
+
+
+async def find_matches(
+    session: AsyncSession, query: PetQuery, limit: int
+) -> list[SearchReadFound]:
+    """Active searches whose pet best matches `query`, best first."""
+    await found_index.sync(session)
+
+    start = time.perf_counter()
+    # A few extra in case some have been deactivated or deleted since
+    ranked = found_index.matrix.top(query, WEIGHTS, limit + 10)
+    FOUND_SCORE_DURATION.observe(time.perf_counter() - start)
+    if not ranked:
+        return []
+
+    statement = (
+        select(Search)
+        .where(col(Search.id).in_([search_id for search_id, _ in ranked]))
+        .options(*SEARCH_READ_FEED_OPTIONS)
+    )
+    searches = {search.id: search for search in (await session.exec(statement))}
+
+    matches = []
+    for search_id, score in ranked:
+        search = searches.get(search_id)
+        if search is None or not search.is_active:
+            found_index.matrix.remove(search_id)
+            continue
+        distance = None
+        location = found_index.matrix.location(search_id)
+        if location is not None and query.lat is not None and query.lon is not None:
+            distance = geo.haversine_km(query.lat, query.lon, *location)
+        matches.append(
+            SearchReadFound.model_validate(
+                search, update={"score": round(score, 4), "distance_km": distance}
+            )
+        )
+        if len(matches) == limit:
+            break
+    return matches
@@ -0,0 +1,157 @@
+import asyncio
+import datetime as dt
+import logging
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.db.engine import engine
+from app.models import IdempotencyKey
+
+__all__ = ["IdempotencyStore", "idempotency_store"]
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEYS_PURGED = Counter(
+    "idempotency_keys_purged_total", "Expired idempotency keys deleted"
+)
+
+
+class IdempotencyStore:
+    """
+    Idempotency keys and the responses stored under them. A request claims
+    its key before running, so a retry arriving meanwhile finds it taken.
+    Expired keys are deleted in bulk by a background task, `batch` rows per
+    statement so the purge never holds long locks.
+    """
+
+    def __init__(
+        self, engine: AsyncEngine, ttl: float, lock: float, purge: float, batch: int
+    ):
+        self.engine = engine
+        self.ttl = dt.timedelta(seconds=ttl)
+        self.lock = dt.timedelta(seconds=lock)
+        self.purge_interval = purge
+        self.batch = batch
+        self._stopped = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def claim(self, key: str, fingerprint: str) -> IdempotencyKey | None:
+        """
+        Takes `key` for a request about to run, returning None. If the key
+        is already held, returns its row instead: a stored response, or one
+        still running when `status_code` is None. Expired keys, and keys
+        held past `lock` by a request that never finished, are taken over.
+        """
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            for _ in range(2):
+                now = dt.datetime.utcnow()
+                session.add(
+                    IdempotencyKey(
+                        key=key,
+                        fingerprint=fingerprint,
+                        created_at=now,
+                        expires_at=now + self.ttl,
+                    )
+                )
+                try:
+                    await session.commit()
+                    return None
+                except IntegrityError:
+                    await session.rollback()
+
+                held = await session.get(IdempotencyKey, key)
+                if held is None:
+                    # Purged in between
+                    continue
+                abandoned = (
+                    held.status_code is None and held.created_at < now - self.lock
+                )
+                if held.expires_at > now and not abandoned:
+                    return held
+                # Only if no other retry took it over first
+                await session.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.key == key,  # type: ignore
+                        IdempotencyKey.created_at == held.created_at,  # type: ignore
+                    )
+                )
+                await session.commit()
+                session.expunge_all()
+        # Other retries keep taking it over, so one of them is running it
+        return IdempotencyKey(key=key, fingerprint=fingerprint, expires_at=now)
+
+    async def save(
+        self, key: str, status_code: int, headers: list[list[str]], body: bytes
+    ):
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)  # type: ignore
+                .values(status_code=status_code, headers=headers, body=body)
+            )
+
+    async def release(self, key: str):
+        """Frees `key` without a response, so a retry runs the request again."""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key == key)  # type: ignore
+            )
+
+    async def purge(self) -> int:
+        """Deletes every expired key, returning how many."""
+        total = 0
+        while True:
+            expired = (
+                select(IdempotencyKey.key)
+                .where(IdempotencyKey.expires_at <= dt.datetime.utcnow())  # type: ignore
+                .limit(self.batch)
+            )
+            async with self.engine.begin() as conn:
+                result = await conn.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.key.in_(expired)  # type: ignore
+                    )
+                )
+            total += result.rowcount
+            IDEMPOTENCY_KEYS_PURGED.inc(result.rowcount)
+            if result.rowcount < self.batch:
+                return total
+
+    async def start(self):
+        if self.purge_interval <= 0 or self._task is not None:
+            return
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._purge())
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _purge(self):
+        while not self._stopped.is_set():
+            try:
+                purged = await self.purge()
+                if purged:
+                    logger.info("Purged %d expired idempotency keys", purged)
+            except Exception:
+                logger.exception("Could not purge idempotency keys")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.purge_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+idempotency_store = IdempotencyStore(
+    engine,
+    settings.IDEMPOTENCY_TTL_SECONDS,
+    settings.IDEMPOTENCY_LOCK_SECONDS,
+    settings.IDEMPOTENCY_PURGE_SECONDS,
+    settings.IDEMPOTENCY_PURGE_BATCH_SIZE,
+)
@@ -0,0 +1,208 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import sqlalchemy.exc
+from sqlalchemy import Engine, Pool, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import Counter, Gauge, Histogram
+
+__all__ = [
+    "QueryBudgetExceeded",
+    "StatementCounter",
+    "count_statements",
+    "QueryStats",
+    "track_queries",
+    "instrument_queries",
+    "instrument_pool",
+    "timed_pool_class",
+]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class StatementCounter:
+    statements: list[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_statements(
+    engine: Engine | AsyncEngine, budget: int | None = None
+) -> Iterator[StatementCounter]:
+    """
+    Records every SQL statement sent through `engine` while the block runs.
+    With a `budget`, leaving the block raises QueryBudgetExceeded if more
+    statements than that were issued, which catches N+1 regressions.
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    counter = StatementCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    if budget is not None and counter.count > budget:
+        raise QueryBudgetExceeded(
+            f"{counter.count} statements issued, budget is {budget}:\n"
+            + "\n".join(counter.statements)
+        )
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    # Enclosing track_queries() block, which sees the same statements
+    parent: "QueryStats | None" = field(default=None, repr=False)
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Collects the number of statements and the time spent executing them
+    for the code running in the current context (e.g. one request), on
+    every engine set up with instrument_queries(). Blocks can be nested.
+    """
+    stats = QueryStats(parent=_query_stats.get())
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def instrument_queries(engine: Engine | AsyncEngine):
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+
+    def record(context):
+        stats = _query_stats.get()
+        start = getattr(context, "query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        context.query_start = None
+        while stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+            stats = stats.parent
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if context is not None:
+            context.query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        record(context)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        record(exception_context.execution_context)
+
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ("pool",),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    ("pool",),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ("pool",),
+)
+DB_POOL_CONNECTIONS_OPENED = Counter(
+    "db_pool_connections_opened_total",
+    "New DBAPI connections opened by the pool",
+    ("pool",),
+)
+DB_POOL_CONNECTIONS_CLOSED = Counter(
+    "db_pool_connections_closed_total",
+    "DBAPI connections closed by the pool",
+    ("pool",),
+)
+DB_POOL_CONNECTIONS_INVALIDATED = Counter(
+    "db_pool_connections_invalidated_total",
+    "Connections discarded after an error, failed pre-ping or recycle",
+    ("pool",),
+)
+
+
+class _TimedCheckout:
+    """Pool mixin timing how long each checkout waits for a connection."""
+
+    metrics_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore
+        except sqlalchemy.exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(pool=self.metrics_name)
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(
+                time.perf_counter() - start, pool=self.metrics_name
+            )
+
+
+def timed_pool_class(pool_class: type[Pool], name: str) -> type[Pool]:
+    return type(
+        f"Timed{pool_class.__name__}",
+        (_TimedCheckout, pool_class),
+        {"metrics_name": name},
+    )
+
+
+def instrument_pool(engine: Engine | AsyncEngine, name: str):
+    """Feeds the db_pool_* metrics from `engine`'s pool events."""
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_conn, record, proxy):
+        DB_POOL_CHECKED_OUT.inc(pool=name)
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_conn, record):
+        DB_POOL_CHECKED_OUT.dec(pool=name)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_conn, record):
+        DB_POOL_CONNECTIONS_OPENED.inc(pool=name)
+
+    @event.listens_for(engine, "close")
+    def on_close(dbapi_conn, record):
+        DB_POOL_CONNECTIONS_CLOSED.inc(pool=name)
+
+    @event.listens_for(engine, "close_detached")
+    def on_close_detached(dbapi_conn):
+        DB_POOL_CONNECTIONS_CLOSED.inc(pool=name)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_conn, record, exception):
+        DB_POOL_CONNECTIONS_INVALIDATED.inc(pool=name)
@@ -0,0 +1,261 @@
+import asyncio
+import datetime as dt
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from tenacity import RetryCallState, wait_exponential_jitter
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.db.engine import engine
+from app.models import Job, JobStatus
+
+__all__ = ["job", "enqueue", "retry_delay", "JobWorker", "worker"]
+
+logger = logging.getLogger(__name__)
+
+JOBS = Counter(
+    "jobs_total", "Background jobs run, by kind and outcome", ("kind", "outcome")
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Time spent running background jobs", ("kind",)
+)
+
+Handler = Callable[[dict[str, Any]], Awaitable[None]]
+handlers: dict[str, Handler] = {}
+
+
+def job(kind: str) -> Callable[[Handler], Handler]:
+    """Registers the handler of jobs of `kind`, called with their payload."""
+
+    def register(fn: Handler) -> Handler:
+        handlers[kind] = fn
+        return fn
+
+    return register
+
+
+def enqueue(
+    session: AsyncSession,
+    kind: str,
+    payload: dict[str, Any] | None = None,
+    delay: float = 0,
+) -> Job:
+    """
+    Adds a job to `session`. It is stored by the same commit as the write
+    that caused it, so it runs if and only if that write happened.
+    """
+    db_obj = Job(
+        kind=kind,
+        payload=payload or {},
+        run_at=dt.datetime.utcnow() + dt.timedelta(seconds=delay),
+    )
+    session.add(db_obj)
+    session.info["jobs_enqueued"] = True
+    return db_obj
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_worker(session: Session):
+    if session.info.pop("jobs_enqueued", False):
+        worker.wake()
+
+
+_backoff = wait_exponential_jitter(
+    initial=settings.JOB_RETRY_BACKOFF_SECONDS,
+    max=settings.JOB_RETRY_MAX_SECONDS,
+    jitter=settings.JOB_RETRY_BACKOFF_SECONDS,
+)
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before running again a job that failed `attempts` times."""
+    state = RetryCallState(None, None, (), {})
+    state.attempt_number = attempts
+    return _backoff(state)
+
+
+class JobWorker:
+    """
+    Runs jobs from the job table on `concurrency` tasks of this process.
+    Commits that enqueue jobs wake it up; jobs enqueued by other processes
+    or due for a retry are found by polling every `poll` seconds. Claiming
+    skips rows locked by other workers, so any number of processes can
+    share the table. Finished jobs are deleted, jobs that failed for good
+    are kept with their last error.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        concurrency: int,
+        poll: float,
+        timeout: float,
+        max_attempts: int,
+    ):
+        self.engine = engine
+        self.concurrency = concurrency
+        self.poll = poll
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def start(self):
+        if self.concurrency <= 0 or self._tasks:
+            return
+        self._stopped.clear()
+        self._tasks = [asyncio.create_task(self._reap())]
+        self._tasks += [
+            asyncio.create_task(self._run()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self, grace: float = 10):
+        """Lets running jobs finish for up to `grace` seconds, then cancels them."""
+        self._stopped.set()
+        self.wake()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                claimed = await self.claim()
+            except Exception:
+                logger.exception("Could not claim a job")
+                claimed = None
+            if claimed is not None:
+                await self.execute(claimed)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reap(self):
+        while not self._stopped.is_set():
+            try:
+                await self.requeue_lost()
+            except Exception:
+                logger.exception("Could not requeue lost jobs")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self) -> Job | None:
+        """Marks the next due job as running and returns it."""
+        now = dt.datetime.utcnow()
+        next_id = (
+            select(Job.id)
+            .where(Job.status == JobStatus.PENDING, Job.run_at <= now)
+            .order_by(Job.run_at)  # type: ignore
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        statement = (
+            update(Job)
+            .where(Job.id == next_id, Job.status == JobStatus.PENDING)  # type: ignore
+            .values(status=JobStatus.RUNNING, locked_at=now, attempts=Job.attempts + 1)
+            .returning(Job)
+            .execution_options(synchronize_session=False)
+        )
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            claimed = (await session.scalars(statement)).first()
+            await session.commit()
+        return claimed
+
+    async def execute(self, claimed: Job):
+        handler = handlers.get(claimed.kind)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {claimed.kind!r}")
+            async with asyncio.timeout(self.timeout):
+                await handler(claimed.payload)
+        except Exception as exc:
+            await self._failed(claimed, exc)
+        else:
+            await self._finish(delete(Job).where(Job.id == claimed.id))  # type: ignore
+            JOBS.inc(kind=claimed.kind, outcome="done")
+        finally:
+            JOB_DURATION.observe(time.perf_counter() - start, kind=claimed.kind)
+
+    async def _failed(self, claimed: Job, exc: Exception):
+        error = f"{type(exc).__name__}: {exc}"
+        values: dict[str, Any] = {"locked_at": None, "last_error": error}
+        if claimed.attempts >= self.max_attempts:
+            logger.exception("Job %s (%s) failed for good", claimed.id, claimed.kind)
+            values["status"] = JobStatus.FAILED
+            outcome = "failed"
+        else:
+            delay = retry_delay(claimed.attempts)
+            logger.warning(
+                "Job %s (%s) failed, retrying in %.0fs: %s",
+                claimed.id,
+                claimed.kind,
+                delay,
+                error,
+            )
+            values["status"] = JobStatus.PENDING
+            values["run_at"] = dt.datetime.utcnow() + dt.timedelta(seconds=delay)
+            outcome = "retry"
+        await self._finish(update(Job).where(Job.id == claimed.id).values(**values))  # type: ignore
+        JOBS.inc(kind=claimed.kind, outcome=outcome)
+
+    async def _finish(self, statement):
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(statement)
+        except Exception:
+            # The job stays running and is picked up again by requeue_lost
+            logger.exception("Could not record the outcome of a job")
+
+    async def requeue_lost(self) -> int:
+        """
+        Puts back jobs left running by a process that died, or gives them up
+        once out of attempts. A job is cancelled after `timeout`, so one
+        running for twice as long has no live worker.
+        """
+        cutoff = dt.datetime.utcnow() - dt.timedelta(seconds=2 * self.timeout)
+        lost = (Job.status == JobStatus.RUNNING, Job.locked_at < cutoff)  # type: ignore
+        async with self.engine.begin() as conn:
+            failed = await conn.execute(
+                update(Job)
+                .where(*lost, Job.attempts >= self.max_attempts)
+                .values(status=JobStatus.FAILED, last_error="Lost while running")
+            )
+            requeued = await conn.execute(
+                update(Job)
+                .where(*lost)
+                .values(status=JobStatus.PENDING, locked_at=None)
+            )
+        if failed.rowcount or requeued.rowcount:
+            logger.warning(
+                "Requeued %d lost jobs, gave up %d", requeued.rowcount, failed.rowcount
+            )
+        return requeued.rowcount
+
+
+worker = JobWorker(
+    engine,
+    settings.JOB_WORKERS,
+    settings.JOB_POLL_SECONDS,
+    settings.JOB_TIMEOUT_SECONDS,
+    settings.JOB_MAX_ATTEMPTS,
+)
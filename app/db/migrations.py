@@ -0,0 +1,101 @@
+from logging import Logger
+from pathlib import Path
+from typing import Sequence
+
+from alembic import command, op
+from alembic.config import Config
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.sql.elements import ColumnElement, TextClause
+
+from app.db.engine import engine
+
+__all__ = [
+    "BASELINE_REVISION",
+    "alembic_config",
+    "migrate",
+    "create_index",
+    "drop_index",
+    "is_postgres",
+]
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Schema create_all built before migrations were introduced
+BASELINE_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "app" / "alembic"))
+    return config
+
+
+# Postgres advisory lock held while migrating, so containers started
+# together run the migrations one at a time, the later ones finding
+# nothing left to do
+MIGRATION_LOCK_ID = 0x62757363  # "busc"
+
+
+def _upgrade(connection: Connection, logger: Logger):
+    config = alembic_config()
+    config.attributes["connection"] = connection
+
+    postgres = connection.dialect.name == "postgresql"
+    if postgres:
+        # Session level, so it outlasts the commits of autocommit blocks
+        connection.execute(text(f"SELECT pg_advisory_lock({MIGRATION_LOCK_ID})"))
+        connection.commit()
+    try:
+        tables = inspect(connection).get_table_names()
+        connection.commit()
+        if "alembic_version" not in tables and "user" in tables:
+            logger.info("Unversioned database, stamping revision %s", BASELINE_REVISION)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+    finally:
+        if postgres:
+            connection.rollback()
+            connection.execute(text(f"SELECT pg_advisory_unlock({MIGRATION_LOCK_ID})"))
+            connection.commit()
+
+
+async def migrate(logger: Logger):
+    """Brings the database schema up to the latest migration."""
+    async with engine.connect() as conn:
+        await conn.run_sync(_upgrade, logger)
+
+
+# Helpers for migration scripts
+
+
+def create_index(
+    name: str,
+    table: str,
+    columns: Sequence[str | TextClause | ColumnElement],
+    **kwargs,
+):
+    """
+    Creates an index without locking the table against writes: on Postgres
+    with CREATE INDEX CONCURRENTLY, which must run outside a transaction.
+    Skipped if it already exists.
+    """
+    with op.get_context().autocommit_block():
+        op.create_index(
+            name,
+            table,
+            columns,  # type: ignore
+            postgresql_concurrently=True,
+            if_not_exists=True,
+            **kwargs,
+        )
+
+
+def drop_index(name: str, table: str):
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            name, table_name=table, postgresql_concurrently=True, if_exists=True
+        )
+
+
+def is_postgres() -> bool:
+    return op.get_context().dialect.name == "postgresql"
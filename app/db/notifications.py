@@ -0,0 +1,124 @@
+import asyncio
+import datetime as dt
+import time
+
+from sqlalchemy import insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import geo
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+from app.models import Notification, Search, Sighting, Subscription
+
+__all__ = ["SubscriptionIndex", "subscription_index", "notify_nearby"]
+
+SUBSCRIPTIONS_INDEXED = Gauge(
+    "notification_subscriptions_indexed", "Subscriptions held in the grid index"
+)
+NOTIFICATIONS = Counter(
+    "notifications_total", "Notifications written to the outbox", ("event",)
+)
+MATCH_DURATION = Histogram(
+    "notification_match_seconds", "Time matching one event against subscriptions"
+)
+
+# Rows updated this long before the last sync are read again, for writes
+# that committed late or came from a host whose clock is behind
+SYNC_OVERLAP = dt.timedelta(seconds=60)
+
+
+class SubscriptionIndex:
+    """
+    Active subscriptions of this process on a geo.CircleGrid, each circle
+    valued with its user id. The first sync loads them all, later ones only
+    the rows changed since, found through the updated_at index.
+    """
+
+    def __init__(self, precision: int):
+        self.grid: geo.CircleGrid[int, int] = geo.CircleGrid(precision)
+        self.synced_at: dt.datetime | None = None
+        self._lock = asyncio.Lock()
+
+    def apply(self, subscription: Subscription):
+        if subscription.is_active:
+            circle = geo.Circle(
+                subscription.lat,
+                subscription.lon,
+                subscription.radius_km,
+                subscription.user_id,
+            )
+            self.grid.add(subscription.id, circle)
+        else:
+            self.grid.remove(subscription.id)
+
+    async def sync(self, session: AsyncSession):
+        async with self._lock:
+            started = dt.datetime.utcnow()
+            statement = select(Subscription)
+            if self.synced_at is None:
+                statement = statement.where(col(Subscription.is_active))
+            else:
+                since = self.synced_at - SYNC_OVERLAP
+                statement = statement.where(Subscription.updated_at >= since)
+
+            for subscription in (await session.exec(statement)).all():
+                self.apply(subscription)
+            self.synced_at = started
+            SUBSCRIPTIONS_INDEXED.set(len(self.grid))
+
+    def users_near(self, lat: float, lon: float) -> set[int]:
+        return {circle.value for circle in self.grid.containing(lat, lon)}
+
+
+subscription_index = SubscriptionIndex(settings.SUBSCRIPTION_GRID_PRECISION)
+
+
+async def notify_nearby(
+    session: AsyncSession, search_id: int, sighting_ids: list[int], event: str
+) -> int:
+    """
+    Writes a notification for each user subscribed to an area containing
+    one of the sightings, at most one per user, leaving out the search's
+    owner. Returns how many were written.
+    """
+    search = await session.get(Search, search_id)
+    if search is None or not search.is_active:
+        return 0
+    sightings = (
+        await session.exec(
+            select(Sighting).where(
+                col(Sighting.id).in_(sighting_ids), col(Sighting.lat).is_not(None)
+            )
+        )
+    ).all()
+    if not sightings:
+        return 0
+
+    await subscription_index.sync(session)
+    start = time.perf_counter()
+    matched: dict[int, int] = {}
+    for sighting in sightings:
+        for user_id in subscription_index.users_near(sighting.lat, sighting.lon):  # type: ignore
+            matched.setdefault(user_id, sighting.id)  # type: ignore
+    matched.pop(search.user_id, None)
+    MATCH_DURATION.observe(time.perf_counter() - start)
+
+    now = dt.datetime.utcnow()
+    rows = [
+        {
+            "event": event,
+            "created_at": now,
+            "search_id": search_id,
+            "sighting_id": sighting_id,
+            "user_id": user_id,
+        }
+        for user_id, sighting_id in matched.items()
+    ]
+    size = settings.NOTIFICATION_BATCH_SIZE
+    for i in range(0, len(rows), size):
+        await session.execute(insert(Notification), rows[i : i + size])
+    await session.commit()
+
+    NOTIFICATIONS.inc(len(rows), event=event)
+    return len(rows)
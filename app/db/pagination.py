@@ -0,0 +1,75 @@
+import base64
+import datetime as dt
+import json
+from typing import Any, Sequence
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+__all__ = ["InvalidCursor", "encode_cursor", "decode_cursor", "paginate"]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _to_json(value: Any):
+    if isinstance(value, dt.datetime):
+        return value.isoformat()
+    return value
+
+
+def _from_json(value: Any, column: InstrumentedAttribute):
+    python_type = column.type.python_type
+    if python_type is dt.datetime:
+        return dt.datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[InstrumentedAttribute]) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor("Malformed cursor")
+        return tuple(_from_json(v, c) for v, c in zip(values, columns))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+
+async def paginate(
+    session: AsyncSession,
+    statement: SelectOfScalar,
+    columns: Sequence[InstrumentedAttribute],
+    *,
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+) -> tuple[list, str | None]:
+    """
+    Orders `statement` by `columns` (all descending) and returns one page
+    plus the cursor of the next one.
+
+    With a cursor the page starts right after the row it points to, which
+    the database resolves with an index seek instead of scanning `skip` rows.
+    `columns` must end with a unique column so the ordering is total.
+    """
+    statement = statement.order_by(*(c.desc() for c in columns))
+    if cursor:
+        statement = statement.where(tuple_(*columns) < decode_cursor(cursor, columns))
+    else:
+        statement = statement.offset(skip)
+
+    rows = (await session.exec(statement.limit(limit))).all()
+
+    next_cursor = None
+    if rows and len(rows) == limit:
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return list(rows), next_cursor
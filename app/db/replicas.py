@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from typing import Callable
+
+import sqlalchemy.exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.db.engine import engine, replica_engine
+
+__all__ = ["ReadRouter", "read_router"]
+
+logger = logging.getLogger(__name__)
+
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total",
+    "Read-only sessions, by the engine serving them",
+    ("engine",),
+)
+DB_REPLICA_FAILURES = Counter(
+    "db_replica_failures_total", "Replica connections failed, falling back to primary"
+)
+
+
+class ReadRouter:
+    """
+    Chooses the engine behind read-only sessions. Reads go to the replica
+    except for clients that wrote within the stickiness window, who would
+    otherwise not see their own writes until replication catches up, and
+    while the replica is failing, when everything reads from the primary
+    for `retry` seconds.
+
+    Writers carry their stickiness themselves, as a token signed with
+    `secret` (see sticky_token), since their next read may be served by
+    another process.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replica: AsyncEngine | None,
+        stickiness: float,
+        retry: float,
+        secret: str,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.stickiness = stickiness
+        self.retry = retry
+        self._secret = secret.encode()
+        self._timer = timer
+        self._down_until = 0.0
+
+    def _sign(self, until: str) -> str:
+        return hmac.new(self._secret, until.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def sticky_token(self) -> str:
+        """Token for a client that just wrote, valid for the stickiness window."""
+        until = str(int(time.time() + self.stickiness))
+        return f"{until}.{self._sign(until)}"
+
+    def is_sticky(self, token: str | None) -> bool:
+        until, _, signature = (token or "").partition(".")
+        return (
+            until.isdigit()
+            and int(until) >= time.time()
+            and hmac.compare_digest(signature, self._sign(until))
+        )
+
+    def engine_for(self, sticky: bool) -> AsyncEngine:
+        if self.replica is None or self._timer() < self._down_until or sticky:
+            return self.primary
+        return self.replica
+
+    def failed(self, exc: BaseException):
+        DB_REPLICA_FAILURES.inc()
+        self._down_until = self._timer() + self.retry
+        logger.warning(
+            "Read replica unavailable, reading from primary for %ss: %r",
+            self.retry,
+            exc,
+        )
+
+    async def session(self, sticky: bool = False) -> AsyncSession:
+        """
+        A session for reads, on the primary for a `sticky` client. A replica
+        session is connected up front, so an unreachable replica is replaced
+        by the primary before the route runs any query.
+        """
+        target = self.engine_for(sticky)
+        session = AsyncSession(target, expire_on_commit=False)
+        if target is self.replica:
+            try:
+                async with asyncio.timeout(settings.REPLICA_CONNECT_TIMEOUT_SECONDS):
+                    await session.connection()
+            except (sqlalchemy.exc.SQLAlchemyError, OSError, TimeoutError) as exc:
+                await session.close()
+                self.failed(exc)
+                target = self.primary
+                session = AsyncSession(target, expire_on_commit=False)
+
+        DB_READ_SESSIONS.inc(engine="replica" if target is self.replica else "primary")
+        return session
+
+
+read_router = ReadRouter(
+    engine,
+    replica_engine,
+    settings.READ_YOUR_WRITES_SECONDS,
+    settings.REPLICA_RETRY_SECONDS,
+    settings.SECRET_KEY,
+)
@@ -0,0 +1,44 @@
+"""
+Handlers of the background jobs enqueued by crud and the routes, run by
+app.db.jobs.worker. Importing this module registers them.
+"""
+
+import logging
+from typing import Any
+
+import anyio
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import storage
+from app.db import crud, notifications
+from app.db.engine import engine
+from app.db.jobs import job
+from app.models import NotificationEvent
+
+logger = logging.getLogger(__name__)
+
+
+@job("make_thumbnails")
+async def make_thumbnails(payload: dict[str, Any]):
+    await anyio.to_thread.run_sync(storage.make_thumbnails, payload["image_id"])
+
+
+@job("password_recovery")
+async def password_recovery(payload: dict[str, Any]):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await crud.get_user_by_email(session, payload["email"])
+    if user is None or not user.is_active:
+        return
+    # Mockado: no email is sent yet
+    logger.info("Password recovery email for user %s", user.id)
+
+
+@job("notify_sightings")
+async def notify_sightings(payload: dict[str, Any]):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await notifications.notify_nearby(
+            session,
+            payload["search_id"],
+            payload["sighting_ids"],
+            payload.get("event", NotificationEvent.SIGHTING),
+        )
@@ -1,9 +1,10 @@
 import datetime as dt
 from enum import StrEnum
-from typing import Union
+from typing import Any, Union
 
-from pydantic import AnyHttpUrl
+from pydantic import AnyHttpUrl, model_validator
 from pydantic_extra_types.phone_numbers import PhoneNumber
+from sqlalchemy import JSON, Column, Index, func
 from sqlmodel import SQLModel, Field, Relationship
 
 
@@ -30,7 +31,7 @@ class Pet(PetBase, table=True):
     image: str
 
     # Pet -< User
-    user_id: int = Field(default=None, foreign_key="user.id")
+    user_id: int = Field(default=None, foreign_key="user.id", index=True)
     user: Union["User", None] = Relationship(back_populates="pets")
 
     # Pet >- Search
@@ -110,15 +111,28 @@ class UserReadWSearchPet(UserReadWSearch, UserReadWPet):
 
 class SightingBase(SQLModel):
     loc: str
-    datetime: dt.datetime = Field(default=dt.datetime.utcnow())
+    datetime: dt.datetime = Field(default_factory=dt.datetime.utcnow)
+    lat: float | None = Field(default=None, ge=-90, le=90)
+    lon: float | None = Field(default=None, ge=-180, le=180)
 
 
 class NewSighting(SightingBase):
-    pass
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if (self.lat is None) != (self.lon is None):
+            raise ValueError("lat and lon must be given together")
+        return self
 
 
 class Sighting(SightingBase, table=True):
+    __table_args__ = (
+        # Latest sighting of a search: ORDER BY datetime DESC, id DESC
+        Index("ix_sighting_search_id_datetime_id", "search_id", "datetime", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
+    # Geohash of (lat, lon), prefix ranges on it find sightings near a point
+    geohash: str | None = Field(default=None, index=True, max_length=12)
 
     # Sighting -< Search
     search_id: int = Field(default=None, foreign_key="search.id")
@@ -129,25 +143,46 @@ class SightingRead(SightingBase):
     pass
 
 
+class SightingEvent(SightingRead):
+    search_id: int
+
+
 class SearchBase(SQLModel):
-    created_at: dt.datetime = Field(default=dt.datetime.utcnow())
+    created_at: dt.datetime = Field(default_factory=dt.datetime.utcnow)
     poster: str
     is_active: bool = True
 
 
+class SightingSummary(SQLModel):
+    # Kept in step with the search's sightings by crud, so lists of searches
+    # don't need to load them
+    last_sighting_at: dt.datetime | None = None
+    last_sighting_loc: str | None = None
+    sighting_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+
 class NewSearch(SearchBase):
     sighting: Union[NewSighting, None]
 
 
-class Search(SearchBase, table=True):
+class Search(SightingSummary, SearchBase, table=True):
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC
+        Index("ix_search_created_at_id", "created_at", "id"),
+        Index("ix_search_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
+    # Set by every write to the search or its sightings, for the in-memory
+    # indexes syncing from the database
+    updated_at: dt.datetime = Field(default_factory=dt.datetime.utcnow, index=True)
 
     # Search -< User
     user_id: int = Field(default=None, foreign_key="user.id")
     user: User = Relationship(back_populates="searches")
 
     # Search -< Pet
-    pet_id: int = Field(default=None, foreign_key="pet.id")
+    pet_id: int = Field(default=None, foreign_key="pet.id", index=True)
     pet: Pet = Relationship(back_populates="searches")
 
     # Search >- Sighting
@@ -164,11 +199,11 @@ class SearchRead(SearchBase):
     id: int
 
 
-class SearchReadWUser(SearchBase):
+class SearchReadWUser(SearchRead):
     user: Union[UserRead, None] = None
 
 
-class SearchReadWPet(SearchBase):
+class SearchReadWPet(SearchRead):
     pet: Union[PetRead, None] = None
 
 
@@ -180,6 +215,63 @@ class SearchReadWAll(SearchReadWUserPet):
     sightings: list[SightingRead] = []
 
 
+class SearchReadFeed(SightingSummary, SearchReadWUserPet):
+    pass
+
+
+class SearchReadNearby(SearchReadFeed):
+    distance_km: float
+
+
+class SearchReadFound(SearchReadFeed):
+    score: float
+    distance_km: float | None = None
+
+
+class ListFormat(StrEnum):
+    # Items with their user and pet nested in each
+    FULL = "full"
+    # Items with user_id and pet_id, users and pets listed once beside them
+    NORMALIZED = "normalized"
+
+
+# Attribute filters on /feed/search. Free-text attributes are matched
+# case-insensitively, so the index is on their lowercased values.
+Index(
+    "ix_pet_kind_breed_fur_color_size",
+    Pet.kind,
+    func.lower(Pet.breed),
+    func.lower(Pet.fur_color),
+    func.lower(Pet.size),
+)
+
+# Full-text search over posters and pet names (Postgres only, other
+# databases fall back to substring matching). The GIN indexes are created
+# by migration 0002
+FTS_CONFIG = "simple"
+
+
+class SearchFilter(SQLModel):
+    kind: PetType | None = None
+    breed: str | None = None
+    fur_color: str | None = None
+    size: str | None = None
+    # Words that must all appear in the poster or the pet's name
+    q: str | None = None
+    is_active: bool | None = None
+
+
+# Description of a found animal, matched against lost pets on /feed/found
+class FoundPet(SQLModel):
+    kind: PetType
+    breed: str | None = None
+    fur_color: str | None = None
+    size: str | None = None
+    # Where it was found
+    lat: float | None = Field(default=None, ge=-90, le=90)
+    lon: float | None = Field(default=None, ge=-180, le=180)
+
+
 # Security
 class Token(SQLModel):
     access_token: str
@@ -188,6 +280,16 @@ class Token(SQLModel):
 
 class TokenPayload(SQLModel):
     sub: str | None = None
+    iat: int | None = None
+    # Optional embedded claims, see Settings.ACCESS_TOKEN_EMBED_CLAIMS
+    act: bool | None = None
+    su: bool | None = None
+
+
+class AuthUser(SQLModel):
+    id: int
+    is_active: bool = True
+    is_superuser: bool = False
 
 
 class NewPassword(SQLModel):
@@ -198,3 +300,123 @@ class NewPassword(SQLModel):
 # Generic text
 class Message(SQLModel):
     message: str = ""
+
+
+# Static files
+class ImageRead(SQLModel):
+    id: str
+    url: str
+
+
+# Batch creation
+class BatchItemError(SQLModel):
+    index: int
+    errors: list[dict[str, Any]]
+
+
+class PetBatchResult(SQLModel):
+    created: list[PetRead] = []
+    errors: list[BatchItemError] = []
+
+
+class SightingBatchResult(SQLModel):
+    created: list[SightingRead] = []
+    errors: list[BatchItemError] = []
+
+
+class SearchBatchResult(SQLModel):
+    created: list[SearchReadWAll] = []
+    errors: list[BatchItemError] = []
+
+
+# Nearby notifications, see app.db.notifications
+class SubscriptionBase(SQLModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    radius_km: float = Field(default=5, gt=0)
+
+
+class NewSubscription(SubscriptionBase):
+    pass
+
+
+class Subscription(SubscriptionBase, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    # Deleting only deactivates, so processes syncing their index from
+    # updated_at see the removal
+    is_active: bool = True
+    updated_at: dt.datetime = Field(default_factory=dt.datetime.utcnow, index=True)
+
+    user_id: int = Field(foreign_key="user.id", index=True)
+
+
+class SubscriptionRead(SubscriptionBase):
+    id: int
+
+
+class NotificationEvent(StrEnum):
+    SEARCH = "search"
+    SIGHTING = "sighting"
+
+
+class NotificationBase(SQLModel):
+    event: str = Field(max_length=16)
+    created_at: dt.datetime = Field(default_factory=dt.datetime.utcnow)
+    search_id: int = Field(foreign_key="search.id", index=True)
+    sighting_id: int | None = Field(default=None, foreign_key="sighting.id", index=True)
+
+
+class Notification(NotificationBase, table=True):
+    __table_args__ = (
+        # A user's notifications: ORDER BY created_at DESC, id DESC
+        Index("ix_notification_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    # Outbox: set once delivered to the user
+    sent_at: dt.datetime | None = None
+
+    user_id: int = Field(foreign_key="user.id")
+
+
+class NotificationRead(NotificationBase):
+    id: int
+
+
+# Background jobs, see app.db.jobs
+class JobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+
+
+class Job(SQLModel, table=True):
+    __table_args__ = (
+        # Claiming: WHERE status = 'pending' AND run_at <= now ORDER BY run_at
+        Index("ix_job_status_run_at", "status", "run_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str = Field(max_length=64)
+    payload: dict[str, Any] = Field(
+        default_factory=dict, sa_column=Column(JSON, nullable=False)
+    )
+    status: str = Field(default=JobStatus.PENDING, max_length=16)
+    attempts: int = 0
+    run_at: dt.datetime = Field(default_factory=dt.datetime.utcnow)
+    locked_at: dt.datetime | None = None
+    last_error: str | None = None
+    created_at: dt.datetime = Field(default_factory=dt.datetime.utcnow)
+
+
+class IdempotencyKey(SQLModel, table=True):
+    # Key of the client (see deps.client_key) and its Idempotency-Key header
+    key: str = Field(primary_key=True, max_length=320)
+    # Hash of the method, URL and body of the first request sent with it
+    fingerprint: str = Field(max_length=64)
+    # The stored response, all None while the first request is running
+    status_code: int | None = None
+    headers: list[list[str]] | None = Field(default=None, sa_column=Column(JSON))
+    body: bytes | None = None
+    created_at: dt.datetime = Field(default_factory=dt.datetime.utcnow)
+    expires_at: dt.datetime = Field(index=True)
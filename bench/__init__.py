@@ -0,0 +1,12 @@
+"""
+Benchmarks for the API. Seeds a database through app.db.crud, drives the
+app in-process and writes a JSON report meant to be diffed between commits:
+
+    python -m bench --output before.json
+    python -m bench --output after.json --compare before.json
+
+bench.serialization compares the two ways list endpoints can serialize
+their responses (see FAST_JSON_RESPONSES) without a database.
+
+Needs the packages in bench/requirements.txt on top of the app's.
+"""
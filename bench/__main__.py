@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+DEFAULT_DB = "sqlite+aiosqlite:///bench.db"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench", description="Benchmarks the API in-process."
+    )
+    parser.add_argument(
+        "--db",
+        default=DEFAULT_DB,
+        help="database URI, recreated from scratch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="drop all tables first, required for a database that isn't empty",
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--pets-per-user", type=int, default=3)
+    parser.add_argument("--searches-per-pet", type=int, default=2)
+    parser.add_argument("--sightings-per-search", type=int, default=3)
+    parser.add_argument(
+        "--requests", type=int, default=500, help="requests per scenario"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--bcrypt-rounds",
+        type=int,
+        default=4,
+        help="lower than production so seeding is quick; shows in login times",
+    )
+    parser.add_argument(
+        "--fast-json",
+        action="store_true",
+        help="serve list endpoints with FAST_JSON_RESPONSES",
+    )
+    parser.add_argument(
+        "--only", nargs="+", metavar="SCENARIO", help="scenarios to run"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only check bench.budgets.QUERY_BUDGETS, exiting 1 on a breach",
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument(
+        "--compare", type=Path, metavar="REPORT", help="print changes from a report"
+    )
+    return parser.parse_args()
+
+
+async def reset_database():
+    from sqlalchemy import text
+
+    from app.db.engine import engine
+    from app.models import SQLModel
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+
+def main():
+    args = parse_args()
+
+    # Settings are read on import, so the app is imported only after this
+    os.environ["SQLALCHEMY_DATABASE_URI"] = args.db
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    # Every worker shares one client address; measure the app, not the limits
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    if args.fast_json:
+        os.environ["FAST_JSON_RESPONSES"] = "true"
+    if args.db == DEFAULT_DB:
+        Path("bench.db").unlink(missing_ok=True)
+
+    from bench.report import compare, load
+    from bench.runner import run
+    from bench.seed import Volumes
+
+    if args.reset:
+        asyncio.run(reset_database())
+
+    if args.check:
+        from bench.budgets import check
+
+        volumes = Volumes(
+            users=args.users,
+            pets_per_user=args.pets_per_user,
+            searches_per_pet=args.searches_per_pet,
+            sightings_per_search=args.sightings_per_search,
+        )
+        sys.exit(0 if asyncio.run(check(volumes, args.seed)) else 1)
+
+    volumes = Volumes(
+        users=args.users,
+        pets_per_user=args.pets_per_user,
+        searches_per_pet=args.searches_per_pet,
+        sightings_per_search=args.sightings_per_search,
+    )
+    report = asyncio.run(
+        run(volumes, args.requests, args.concurrency, args.seed, args.only)
+    )
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        print(compare(load(args.compare), report))
+
+
+if __name__ == "__main__":
+    main()
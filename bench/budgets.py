@@ -0,0 +1,62 @@
+import random
+
+import httpx
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.engine import engine
+from app.db.instrumentation import QueryBudgetExceeded, count_statements
+from bench.runner import issue_tokens
+from bench.seed import Volumes, seed
+from main import app
+
+__all__ = ["QUERY_BUDGETS", "check"]
+
+API = settings.API_PATH
+
+# Most SQL statements one request may issue, whatever the page nests. A
+# page that grows past it usually lazy-loads a relationship per item
+QUERY_BUDGETS = {
+    "/feed": 1,
+    "/users/{id}": 4,
+    "/users/{id}/searches/": 2,
+}
+
+
+async def check(volumes: Volumes, rng_seed: int, log=print) -> bool:
+    """
+    Seeds the database, then requests each route in QUERY_BUDGETS once
+    (the feed cache is cold) inside count_statements. Returns whether all
+    of them kept to their budget.
+    """
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        data = await seed(session, volumes, random.Random(rng_seed))
+
+    # The app's lifespan isn't entered: background tasks would issue
+    # statements of their own on the same engine
+    transport = httpx.ASGITransport(app=app)  # type: ignore
+    ok = True
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        tokens = await issue_tokens(client, data)
+        # The user with the most searches, whose pages nest the most
+        user = max(data.users, key=lambda user: len(user.pet_ids))
+        headers = {"Authorization": f"Bearer {tokens[user.id]}"}
+        # Warm the user cache, so every route is counted the same way
+        await client.get(f"{API}/users/me", headers=headers)
+
+        for route, budget in QUERY_BUDGETS.items():
+            url = API + route.replace("{id}", str(user.id))
+            try:
+                with count_statements(engine, budget) as counter:
+                    response = await client.get(url, headers=headers)
+                    response.raise_for_status()
+            except QueryBudgetExceeded as e:
+                ok = False
+                log(f"FAIL {route}: {e}")
+            else:
+                log(f"ok   {route}: {counter.count}/{budget} statements")
+
+    await engine.dispose()
+    return ok
@@ -0,0 +1,91 @@
+import json
+import math
+from collections import Counter
+from pathlib import Path
+
+__all__ = ["percentile", "summarize", "load", "compare"]
+
+# Compared between reports, with True when lower is better
+COMPARED = [
+    ("throughput_rps", False),
+    ("latency_ms.p50", True),
+    ("latency_ms.p95", True),
+    ("latency_ms.p99", True),
+    ("sql.mean", True),
+]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(
+    route: str,
+    latencies: list[float],
+    statements: list[int],
+    statuses: Counter,
+    cache: Counter,
+    elapsed: float,
+) -> dict:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    statements = sorted(statements)
+    count = len(latencies_ms)
+    return {
+        "route": route,
+        "requests": count,
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+        "status": {str(status): n for status, n in sorted(statuses.items())},
+        "cache": dict(sorted(cache.items())),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies_ms) / count, 3) if count else 0.0,
+            "p50": round(percentile(latencies_ms, 50), 3),
+            "p95": round(percentile(latencies_ms, 95), 3),
+            "p99": round(percentile(latencies_ms, 99), 3),
+            "max": round(latencies_ms[-1], 3) if count else 0.0,
+        },
+        "sql": {
+            "mean": round(sum(statements) / count, 2) if count else 0.0,
+            "p95": percentile(statements, 95),  # type: ignore
+            "max": statements[-1] if count else 0,
+        },
+    }
+
+
+def load(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+def _get(summary: dict, dotted: str) -> float | None:
+    value = summary
+    for key in dotted.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value  # type: ignore
+
+
+def compare(old: dict, new: dict) -> str:
+    """Text table of the changes between two reports, endpoint by endpoint."""
+    lines = [f"{'endpoint':<18} {'metric':<16} {'old':>10} {'new':>10} {'change':>8}"]
+    for name, summary in new["endpoints"].items():
+        previous = old["endpoints"].get(name)
+        if previous is None:
+            lines.append(f"{name:<18} (new)")
+            continue
+        for metric, lower_is_better in COMPARED:
+            before, after = _get(previous, metric), _get(summary, metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = change > 0 if lower_is_better else change < 0
+            flag = " !" if worse and abs(change) >= 10 else ""
+            lines.append(
+                f"{name:<18} {metric:<16} {before:>10} {after:>10} "
+                f"{change:>+7.1f}%{flag}"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+import asyncio
+import datetime as dt
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+
+import httpx
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.engine import engine
+from app.db.instrumentation import track_queries
+from bench.report import summarize
+from bench.scenarios import SCENARIOS, Scenario, Worker
+from bench.seed import SeedData, Volumes, seed
+from main import app
+
+__all__ = ["run"]
+
+
+def git_revision() -> dict:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "-s"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+async def issue_tokens(client: httpx.AsyncClient, data: SeedData) -> dict[int, str]:
+    tokens = {}
+    for user in data.users:
+        response = await client.post(
+            f"{settings.API_PATH}/login/token",
+            data={"username": user.email, "password": user.password},
+        )
+        response.raise_for_status()
+        tokens[user.id] = response.json()["access_token"]
+    return tokens
+
+
+async def run_scenario(
+    scenario: Scenario,
+    client: httpx.AsyncClient,
+    data: SeedData,
+    tokens: dict[int, str],
+    requests: int,
+    concurrency: int,
+    rng_seed: int,
+) -> dict:
+    latencies: list[float] = []
+    statements: list[int] = []
+    statuses: Counter = Counter()
+    cache: Counter = Counter()
+    remaining = requests
+
+    async def work(worker: Worker):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            with track_queries() as queries:
+                start = time.perf_counter()
+                response = await scenario.run(worker)
+                latencies.append(time.perf_counter() - start)
+            statements.append(queries.count)
+            statuses[response.status_code] += 1
+            if hit := response.headers.get("X-Cache"):
+                cache[hit] += 1
+
+    workers = [
+        Worker(client, data, random.Random(f"{rng_seed}-{scenario.name}-{i}"), tokens)
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(work(worker) for worker in workers))
+    elapsed = time.perf_counter() - start
+
+    return summarize(scenario.route, latencies, statements, statuses, cache, elapsed)
+
+
+async def run(
+    volumes: Volumes,
+    requests: int,
+    concurrency: int,
+    rng_seed: int,
+    only: list[str] | None = None,
+    log=print,
+) -> dict:
+    """
+    Seeds the database, then runs each scenario in turn against the app
+    in-process. Returns the report.
+    """
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        started = time.perf_counter()
+        data = await seed(session, volumes, random.Random(rng_seed))
+        log(f"Seeded {data.searches} searches in {time.perf_counter() - started:.1f}s")
+
+    transport = httpx.ASGITransport(app=app)  # type: ignore
+    report: dict = {
+        "meta": {
+            **git_revision(),
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "volumes": vars(volumes),
+            "requests": requests,
+            "concurrency": concurrency,
+            "seed": rng_seed,
+            "settings": {
+                "BCRYPT_ROUNDS": settings.BCRYPT_ROUNDS,
+                "ACCESS_TOKEN_EMBED_CLAIMS": settings.ACCESS_TOKEN_EMBED_CLAIMS,
+                "DB_POOL_SIZE": settings.DB_POOL_SIZE,
+                "FEED_CACHE_TTL_SECONDS": settings.FEED_CACHE_TTL_SECONDS,
+                "FAST_JSON_RESPONSES": settings.FAST_JSON_RESPONSES,
+                "RATE_LIMIT_ENABLED": settings.RATE_LIMIT_ENABLED,
+                "MAX_CONCURRENT_REQUESTS": settings.MAX_CONCURRENT_REQUESTS,
+                "JOB_WORKERS": settings.JOB_WORKERS,
+            },
+        },
+        "endpoints": {},
+    }
+
+    scenarios = [s for s in SCENARIOS if not only or s.name in only]
+    # Reads first, on the seeded data only
+    scenarios.sort(key=lambda s: s.writes)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            tokens = await issue_tokens(client, data)
+            for scenario in scenarios:
+                summary = await run_scenario(
+                    scenario, client, data, tokens, requests, concurrency, rng_seed
+                )
+                report["endpoints"][scenario.name] = summary
+                log(
+                    f"{scenario.name:<18} {summary['throughput_rps']:>8} req/s  "
+                    f"p50 {summary['latency_ms']['p50']:>8} ms  "
+                    f"p99 {summary['latency_ms']['p99']:>8} ms  "
+                    f"sql {summary['sql']['mean']:>5}"
+                )
+
+    await engine.dispose()
+    return report
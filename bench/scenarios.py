@@ -0,0 +1,117 @@
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+from app.core.config import settings
+from bench.seed import WORDS, SeedData, random_point, random_poster
+
+__all__ = ["Worker", "Scenario", "SCENARIOS"]
+
+API = settings.API_PATH
+
+
+@dataclass
+class Worker:
+    """Per-worker state: its own rng and whatever a scenario carries over."""
+
+    client: httpx.AsyncClient
+    data: SeedData
+    rng: random.Random
+    tokens: dict[int, str]
+    state: dict = field(default_factory=dict)
+
+    def auth(self, user_id: int) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    route: str
+    run: Callable[[Worker], Awaitable[httpx.Response]]
+    # Writes change what the reads see, so they run after them
+    writes: bool = False
+
+
+async def login(worker: Worker) -> httpx.Response:
+    user = worker.rng.choice(worker.data.users)
+    return await worker.client.post(
+        f"{API}/login/token",
+        data={"username": user.email, "password": user.password},
+    )
+
+
+async def feed_first_page(worker: Worker) -> httpx.Response:
+    return await worker.client.get(f"{API}/feed", params={"limit": 20})
+
+
+async def feed_paging(worker: Worker) -> httpx.Response:
+    # Walks the feed with the cursor, starting over after the last page
+    params = {"limit": 20}
+    if cursor := worker.state.get("cursor"):
+        params["cursor"] = cursor
+    response = await worker.client.get(f"{API}/feed", params=params)
+    worker.state["cursor"] = response.headers.get("X-Next-Cursor")
+    return response
+
+
+async def feed_search(worker: Worker) -> httpx.Response:
+    rng = worker.rng
+    return await worker.client.get(
+        f"{API}/feed/search",
+        params={"kind": rng.choice(["dog", "cat", "bird"]), "q": rng.choice(WORDS)},
+    )
+
+
+async def feed_nearby(worker: Worker) -> httpx.Response:
+    lat, lon = random_point(worker.rng)
+    return await worker.client.get(
+        f"{API}/feed/nearby",
+        params={"lat": lat, "lon": lon, "radius_km": 2, "limit": 20},
+    )
+
+
+async def user_detail(worker: Worker) -> httpx.Response:
+    user = worker.rng.choice(worker.data.users)
+    return await worker.client.get(
+        f"{API}/users/{user.id}", headers=worker.auth(user.id)
+    )
+
+
+async def user_searches(worker: Worker) -> httpx.Response:
+    user = worker.rng.choice(worker.data.users)
+    return await worker.client.get(
+        f"{API}/users/{user.id}/searches/",
+        params={"limit": 20},
+        headers=worker.auth(user.id),
+    )
+
+
+async def create_search(worker: Worker) -> httpx.Response:
+    rng = worker.rng
+    user = rng.choice(worker.data.users)
+    lat, lon = random_point(rng)
+    return await worker.client.post(
+        f"{API}/users/{user.id}/searches/{rng.choice(user.pet_ids)}",
+        json={
+            "poster": random_poster(rng),
+            "sighting": {"loc": "Bench street", "lat": lat, "lon": lon},
+        },
+        headers=worker.auth(user.id),
+    )
+
+
+SCENARIOS = [
+    Scenario("login", "POST /login/token", login),
+    Scenario("feed_first_page", "GET /feed", feed_first_page),
+    Scenario("feed_paging", "GET /feed?cursor", feed_paging),
+    Scenario("feed_search", "GET /feed/search", feed_search),
+    Scenario("feed_nearby", "GET /feed/nearby", feed_nearby),
+    Scenario("user_detail", "GET /users/{user_id}", user_detail),
+    Scenario("user_searches", "GET /users/{user_id}/searches/", user_searches),
+    Scenario(
+        "create_search", "POST /users/{user_id}/searches/{pet_id}", create_search, True
+    ),
+]
@@ -0,0 +1,130 @@
+import datetime as dt
+import logging
+import random
+from dataclasses import dataclass, field
+
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import crud, init_db
+from app.models import NewPet, NewSearch, NewSighting, PetType, Search, UserCreate
+
+__all__ = ["Volumes", "SeedUser", "SeedData", "CENTER", "WORDS", "seed"]
+
+logger = logging.getLogger(__name__)
+
+# Seeded sightings are spread around this point (São Paulo)
+CENTER = (-23.5505, -46.6333)
+SPREAD_KM = 25.0
+
+WORDS = ["lost", "found", "friendly", "scared", "collar", "near", "park", "reward"]
+NAMES = ["Rex", "Luna", "Thor", "Mel", "Bob", "Nina", "Fred", "Lola", "Max", "Bela"]
+COLORS = ["black", "white", "brown", "caramel", "grey", "spotted"]
+SIZES = ["small", "medium", "large"]
+
+
+@dataclass(frozen=True)
+class Volumes:
+    users: int = 50
+    pets_per_user: int = 3
+    searches_per_pet: int = 2
+    sightings_per_search: int = 3
+
+
+@dataclass
+class SeedUser:
+    id: int
+    email: str
+    password: str
+    pet_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class SeedData:
+    users: list[SeedUser]
+    searches: int
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    km_per_degree = 111.32
+    lat = CENTER[0] + rng.uniform(-SPREAD_KM, SPREAD_KM) / km_per_degree
+    lon = CENTER[1] + rng.uniform(-SPREAD_KM, SPREAD_KM) / km_per_degree
+    return lat, lon
+
+
+def random_sighting(rng: random.Random, when: dt.datetime) -> NewSighting:
+    lat, lon = random_point(rng)
+    return NewSighting(
+        loc=f"Street {rng.randint(1, 999)}", lat=lat, lon=lon, datetime=when
+    )
+
+
+def random_poster(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k=4))
+
+
+async def seed(session: AsyncSession, volumes: Volumes, rng: random.Random) -> SeedData:
+    """
+    Fills an empty database through app.db.crud, the same code paths the
+    API writes with. The same `rng` seed always produces the same data.
+    """
+    await init_db(session, logger)
+    existing = (await session.exec(select(func.count()).select_from(Search))).one()
+    if existing:
+        raise RuntimeError("Database already has searches, reset it first")
+
+    start = dt.datetime(2024, 1, 1)
+    users = []
+    searches = 0
+    for u in range(volumes.users):
+        password = f"bench-{u}"
+        user = await crud.create_user(
+            session,
+            UserCreate(
+                email=f"bench{u}@example.com",
+                phone=f"+55119{u:08d}",
+                full_name=f"Bench User {u}",
+                password=password,
+            ),
+        )
+        seed_user = SeedUser(user.id, user.email, password)  # type: ignore
+        users.append(seed_user)
+
+        pets = await crud.create_pets(
+            session,
+            [
+                NewPet(
+                    name=rng.choice(NAMES),
+                    kind=rng.choice(list(PetType)),
+                    breed=None,
+                    fur_color=rng.choice(COLORS),
+                    size=rng.choice(SIZES),
+                    image="https://example.com/pet.png",  # type: ignore
+                )
+                for _ in range(volumes.pets_per_user)
+            ],
+            seed_user.id,
+        )
+        seed_user.pet_ids = [pet.id for pet in pets]  # type: ignore
+
+        for pet in pets:
+            for _ in range(volumes.searches_per_pet):
+                created_at = start + dt.timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+                sightings = [
+                    random_sighting(rng, created_at + dt.timedelta(hours=h))
+                    for h in range(volumes.sightings_per_search)
+                ]
+                search = await crud.create_search(
+                    session,
+                    NewSearch(
+                        poster=random_poster(rng),
+                        created_at=created_at,
+                        sighting=sightings[0] if sightings else None,
+                    ),
+                    seed_user.id,
+                    pet.id,  # type: ignore
+                )
+                await crud.create_sightings(session, sightings[1:], search.id)  # type: ignore
+                searches += 1
+
+    return SeedData(users, searches)
@@ -0,0 +1,140 @@
+"""
+Compares FastAPI's response_model serialization of list endpoints with
+the dump_list path used under FAST_JSON_RESPONSES, on in-memory objects
+shaped like real pages:
+
+    python -m bench.serialization --items 20 --sightings 10
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import random
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.deps import dump_list
+from app.models import (
+    Pet,
+    PetReadWSearch,
+    PetType,
+    Search,
+    SearchReadFeed,
+    SearchReadWAll,
+    Sighting,
+    User,
+)
+from bench.seed import random_point, random_poster
+
+MODELS = {
+    "SearchReadWAll": SearchReadWAll,
+    "SearchReadFeed": SearchReadFeed,
+    "PetReadWSearch": PetReadWSearch,
+}
+
+
+def build_searches(count: int, sightings: int, rng: random.Random) -> list[Search]:
+    user = User(
+        id=1,
+        email="bench@example.com",
+        phone="+5511900000000",
+        full_name="Bench User",
+        hashed_password=b"",
+    )
+    start = dt.datetime(2024, 1, 1)
+    searches = []
+    for i in range(count):
+        pet = Pet(
+            id=i,
+            name="Rex",
+            kind=PetType.DOG,
+            fur_color="brown",
+            image="https://example.com/pet.png",
+            user_id=1,
+        )
+        search = Search(
+            id=i,
+            poster=random_poster(rng),
+            created_at=start,
+            user_id=1,
+            pet_id=i,
+            sighting_count=sightings,
+            last_sighting_at=start,
+            last_sighting_loc="Street 1",
+        )
+        search.user = user
+        search.pet = pet
+        for j in range(sightings):
+            lat, lon = random_point(rng)
+            search.sightings.append(
+                Sighting(
+                    id=i * sightings + j,
+                    loc=f"Street {j}",
+                    datetime=start + dt.timedelta(hours=j),
+                    lat=lat,
+                    lon=lon,
+                    search_id=i,
+                )
+            )
+        searches.append(search)
+    return searches
+
+
+def items_for(model_name: str, searches: list[Search]) -> list:
+    if model_name == "PetReadWSearch":
+        return [search.pet for search in searches]
+    return searches
+
+
+async def fastapi_path(model, items: list) -> bytes:
+    field = create_response_field(name="bench", type_=list[model], mode="serialization")
+    content = await serialize_response(field=field, response_content=items)
+    return JSONResponse(content).body
+
+
+def timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.serialization")
+    parser.add_argument("--items", type=int, default=20, help="items per page")
+    parser.add_argument("--sightings", type=int, default=10, help="per search")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    searches = build_searches(args.items, args.sightings, random.Random(args.seed))
+    loop = asyncio.new_event_loop()
+    results = {}
+    for name, model in MODELS.items():
+        items = items_for(name, searches)
+        current = loop.run_until_complete(fastapi_path(model, items))
+        fast = dump_list(model, items)
+        assert json.loads(current) == json.loads(fast), f"{name} outputs differ"
+
+        current_ms = timed(
+            lambda: loop.run_until_complete(fastapi_path(model, items)),
+            args.iterations,
+        )
+        fast_ms = timed(lambda: dump_list(model, items), args.iterations)
+        results[name] = {
+            "bytes": len(fast),
+            "response_model_ms": round(current_ms, 4),
+            "dump_list_ms": round(fast_ms, 4),
+            "speedup": round(current_ms / fast_ms, 2),
+        }
+    loop.close()
+
+    print(json.dumps({"params": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Times /feed/found's ranking on a PetMatrix of synthetic active searches,
+against scoring the same rows one by one in Python:
+
+    python -m bench.similarity --searches 300000 --queries 200
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+
+from app.core import geo
+from app.core.similarity import ATTRIBUTES, PetMatrix, PetQuery, Weights, normalize
+from bench.report import percentile
+from bench.seed import random_point
+
+KINDS = ("dog", "cat", "bird")
+VALUES = {
+    "breed": [f"breed {i}" for i in range(120)],
+    "fur_color": ["black", "white", "brown", "golden", "gray", "spotted", "mixed"],
+    "size": ["small", "medium", "large"],
+}
+
+
+def random_pet(rng: random.Random) -> dict:
+    pet = {"kind": rng.choice(KINDS)}
+    for attribute in ATTRIBUTES:
+        # Some pets are posted without every attribute
+        pet[attribute] = rng.choice(VALUES[attribute]) if rng.random() < 0.8 else None
+    pet["lat"], pet["lon"] = random_point(rng) if rng.random() < 0.9 else (None, None)
+    return pet
+
+
+def random_query(rng: random.Random) -> PetQuery:
+    lat, lon = random_point(rng)
+    return PetQuery(
+        kind=rng.choice(KINDS),
+        **{attribute: rng.choice(VALUES[attribute]) for attribute in ATTRIBUTES},
+        lat=lat,
+        lon=lon,
+    )
+
+
+def python_top(
+    pets: dict[int, dict], query: PetQuery, weights: Weights, k: int
+) -> list[tuple[int, float]]:
+    """Reference ranking, one row at a time."""
+    scored = []
+    for search_id, pet in pets.items():
+        if pet["kind"] != query.kind:
+            continue
+        score = 0.0
+        for attribute in ATTRIBUTES:
+            weight = getattr(weights, attribute)
+            wanted, value = normalize(getattr(query, attribute)), pet[attribute]
+            if wanted is None or value is None:
+                score += weight / 2
+            elif normalize(value) == wanted:
+                score += weight
+        if pet["lat"] is not None and query.lat is not None:
+            distance = geo.haversine_km(query.lat, query.lon, pet["lat"], pet["lon"])  # type: ignore
+            score += weights.distance * math.exp(-distance / weights.distance_scale_km)
+        scored.append((score, search_id))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [(search_id, score) for score, search_id in scored[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.similarity")
+    parser.add_argument("--searches", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--python-queries", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    weights = Weights()
+    pets = {search_id: random_pet(rng) for search_id in range(1, args.searches + 1)}
+
+    started = time.perf_counter()
+    matrix = PetMatrix()
+    for search_id, pet in pets.items():
+        attributes = {attribute: pet[attribute] for attribute in ATTRIBUTES}
+        matrix.upsert(search_id, pet["kind"], attributes, pet["lat"], pet["lon"])
+    build_s = time.perf_counter() - started
+
+    queries = [random_query(rng) for _ in range(args.queries)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        matrix.top(query, weights, args.limit)
+        latencies.append(time.perf_counter() - started)
+
+    python_latencies = []
+    for query in queries[: args.python_queries]:
+        started = time.perf_counter()
+        expected = python_top(pets, query, weights, args.limit)
+        python_latencies.append(time.perf_counter() - started)
+        got = matrix.top(query, weights, args.limit)
+        assert [i for i, _ in got] == [i for i, _ in expected], "rankings differ"
+        assert all(math.isclose(a, b) for (_, a), (_, b) in zip(got, expected))
+
+    def ms(values: list[float], q: float) -> float:
+        return round(percentile(sorted(values), q) * 1000, 3)
+
+    results = {
+        "build_s": round(build_s, 2),
+        "matrix_ms": {"p50": ms(latencies, 50), "p99": ms(latencies, 99)},
+        "python_ms": {"p50": ms(python_latencies, 50)},
+        "speedup": round(ms(python_latencies, 50) / ms(latencies, 50)),
+    }
+    print(json.dumps({"params": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Production server: gunicorn managing uvicorn workers.
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# The app is imported once in the master and forked into the workers.
+# Signals to the master:
+#   HUP         replace the workers one by one, each finishing its requests
+#               (with preloading this doesn't pick up new code)
+#   USR2, TERM  deploy new code: USR2 starts a new master next to the old
+#               one, then TERM the old master once the new one is serving
+#   TERM        graceful shutdown, waiting up to graceful_timeout
+
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# One worker per container by default: the event broker behind /feed/events,
+# the /metrics registry and the caches live in the worker's memory. With
+# more workers an event stream only sees writes made on its own worker, a
+# reconnect with Last-Event-ID landing on another one gets "reset", and each
+# scrape of /metrics reads a different worker's counters. Raise
+# WEB_CONCURRENCY only where event streams and metrics aren't used. Separate
+# containers are scraped as separate targets, but their event streams are
+# just as separate: clients must stick to one (or expect "reset" events)
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+preload_app = True
+# Restart workers after this many requests (with jitter so they don't all
+# go at once), to bound any slow leak. Off by default: a restart drops every
+# open event stream and empties the worker's caches and metrics
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Addresses of the reverse proxies in front of the app (comma separated, "*"
+# for any). Their X-Forwarded-For/-Proto headers are taken as the client's
+# address and scheme, so rate limits tell clients apart instead of putting
+# everyone behind the proxy in one bucket. Only list hosts that overwrite
+# those headers, anyone else could pick the address they're limited by
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (none normally, but anything touched
+    # while preloading) must not be shared with the children; drop the
+    # inherited pool without closing sockets the master still owns.
+    from app.db.engine import engine, replica_engine
+
+    for pooled in (engine, replica_engine):
+        if pooled is not None:
+            pooled.sync_engine.dispose(close=False)
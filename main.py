@@ -1,10 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+from app import jobs as job_handlers  # noqa: F401, registers the handlers
 from app.api.api import api_router
+from app.api.middleware import (
+    CompressionMiddleware,
+    ConcurrencyLimitMiddleware,
+    IdempotencyMiddleware,
+    RequestMetricsMiddleware,
+)
+from app.core import security
 from app.core.config import settings
+from app.db import jobs
+from app.db.engine import engine, replica_engine
+from app.db.idempotency import idempotency_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await jobs.worker.start()
+    await idempotency_store.start()
+    yield
+    await idempotency_store.stop()
+    await jobs.worker.stop()
+    # Close pooled connections on shutdown instead of leaving them to the
+    # database to time out
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
 
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_PATH}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_PATH}/openapi.json",
+    lifespan=lifespan,
 )
 
+# Last added runs first: metrics also see (and time) requests being shed,
+# replayed responses are only served to admitted requests, and they are
+# stored uncompressed so each retry gets the coding it asked for
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(ConcurrencyLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 app.include_router(api_router, prefix=settings.API_PATH)
+
+
+@app.exception_handler(security.HashPoolSaturated)
+async def hash_pool_saturated_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
@@ -3,6 +3,5 @@ echo "Database startup"
 python startup.py
 echo "====================="
 
-echo "Database startup"
-uvicorn --host "0.0.0.0" --port 8000 main:app
-echo "====================="
\ No newline at end of file
+echo "Server startup"
+exec gunicorn -c gunicorn.conf.py main:app
@@ -1,10 +1,13 @@
+import asyncio
 import logging
 
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from dotenv import find_dotenv, load_dotenv
 from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
 
 from app.db import init_db
+from app.db.checks import unindexed_foreign_keys
 from app.db.engine import engine
 
 logging.basicConfig(level=logging.INFO)
@@ -20,26 +23,28 @@ wait_seconds = 1
     before=before_log(logger, logging.INFO),
     after=after_log(logger, logging.WARN),
 )
-def wait_for_db_startup() -> None:
+async def wait_for_db_startup() -> None:
     try:
-        with Session(engine) as session:
-            session.exec(select(1))
+        async with AsyncSession(engine) as session:
+            await session.exec(select(1))
     except Exception as e:
         logger.error(e)
         raise e
 
 
-def main():
+async def main():
     logger.info("Initializing database...")
     dotenv_status = load_dotenv(find_dotenv())
     logger.info(f".env load status: {'sucess' if dotenv_status else 'failiure'}")
-    wait_for_db_startup()
-    with Session(engine) as session:
-        init_db(session, logger)
+    await wait_for_db_startup()
+    async with AsyncSession(engine) as session:
+        await init_db(session, logger)
     logger.info("Database initialized")
+    for fk in unindexed_foreign_keys():
+        logger.warning(f"Foreign key without an index: {fk}")
 
     # Path().absolute().joinpath("static").mkdir(parents=True, exist_ok=True)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())